@@ -0,0 +1,141 @@
+"""Generates synthetic projects for the benchmarks.
+
+The same arguments and seed always produce the same project, so results from
+different runs and machines are comparable.
+"""
+
+# Standard library imports
+import json
+import random
+import shutil
+from pathlib import Path
+from typing import NamedTuple
+
+# ----- CONSTANTS -----
+
+REPOSITORY_DIR = Path(__file__).resolve().parent.parent
+WORDS = (
+    "static site generator markdown template render article page theme build cache "
+    "index parse content metadata python jinja html style layout output publish "
+    "server request file directory header paragraph link image code block list"
+).split()
+
+BASE_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <title>{{title}}</title>
+</head>
+<body>
+    {% block body %}{% endblock %}
+</body>
+</html>"""
+
+PAGE_TEMPLATE = """{% extends "base.html" %}
+{% block body %}
+<h1>{{title}}</h1>
+{{content}}
+{% endblock %}"""
+
+
+class CorpusConfig(NamedTuple):
+    """Type that represents the shape of a synthetic project."""
+
+    articles: int = 1000
+    pages: int = 10
+    body_size: int = 4000
+    metadata_size: int = 4
+    depth: int = 2
+    seed: int = 0
+
+
+def create_corpus(directory: Path, config: CorpusConfig) -> Path:
+    """Creates a project with the configured number of articles and pages in the
+    directory and returns its path. Existing contents of the directory are removed."""
+
+    if directory.exists():
+        shutil.rmtree(directory)
+    rng = random.Random(config.seed)
+
+    articles_dir = directory / "content" / "articles"
+    pages_dir = directory / "content" / "pages"
+    templates_dir = directory / "templates"
+    for dirpath in (articles_dir, pages_dir, directory / "publish"):
+        dirpath.mkdir(parents=True)
+    shutil.copytree(REPOSITORY_DIR / "templates", templates_dir)
+
+    with open(directory / "config.json", "w+") as f:
+        json.dump(
+            {
+                "project_directory": str(directory.absolute()),
+                "project_name": "benchmark",
+                "theme": "default",
+            },
+            f,
+        )
+
+    for index in range(config.articles):
+        article_dir = articles_dir.joinpath(
+            *(f"section-{rng.randrange(8)}" for _ in range(config.depth))
+        )
+        article_dir.mkdir(parents=True, exist_ok=True)
+        _write_source(article_dir / f"article-{index}.md", index, config, rng)
+
+    (templates_dir / "base.html").write_text(BASE_TEMPLATE)
+    for index in range(config.pages):
+        _write_source(pages_dir / f"page-{index}.md", index, config, rng)
+        (templates_dir / f"page-{index}_template.html").write_text(PAGE_TEMPLATE)
+
+    return directory
+
+
+def _write_source(filepath: Path, index: int, config: CorpusConfig, rng: random.Random):
+    """Writes a markdown file with front matter and a body of roughly the configured
+    size."""
+
+    metadata = [
+        f"title: {_sentence(rng, 6).rstrip('.')}",
+        "author: Benchmark",
+        f"date: 20{10 + index % 15}-{1 + index % 12:02}-{1 + index % 28:02}",
+        f"tags: {', '.join(rng.sample(WORDS, 3))}",
+    ]
+    metadata.extend(
+        f"field_{number}: {_sentence(rng, 4)}"
+        for number in range(max(0, config.metadata_size - len(metadata)))
+    )
+
+    with open(filepath, "w+") as f:
+        f.write("---\n" + "\n".join(metadata) + "\n---\n")
+        f.write(_body(rng, config.body_size))
+
+
+def _body(rng: random.Random, size: int) -> str:
+    """Returns a markdown body made up of the common block and inline elements."""
+
+    blocks: list[str] = []
+    length = 0
+    while length < size:
+        kind = rng.randrange(6)
+        if kind == 0:
+            block = "## " + _sentence(rng, 5)
+        elif kind == 1:
+            block = "\n".join("* " + _sentence(rng, 8) for _ in range(4))
+        elif kind == 2:
+            block = "    " + "\n    ".join(_sentence(rng, 6) for _ in range(3))
+        elif kind == 3:
+            block = (
+                f"See [{rng.choice(WORDS)}](https://example.com/{rng.choice(WORDS)})."
+            )
+        else:
+            block = " ".join(
+                f"*{word}*" if rng.random() < 0.05 else word
+                for word in _sentence(rng, 60).split()
+            )
+        blocks.append(block)
+        length += len(block) + 2
+    return "\n\n".join(blocks) + "\n"
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
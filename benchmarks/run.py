@@ -0,0 +1,316 @@
+"""Benchmarks the generator on a synthetic project.
+
+Measures parsing, markdown conversion, rendering, building and updating the search
+index, complete cold and warm builds and checking the links of the built site, saves
+the results as JSON and compares them against a stored baseline. Run it from the root
+of the repository:
+
+    python -m benchmarks.run --articles 2000 --output results.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+    python -m benchmarks.run --articles 100000 --benchmarks search_index search_update
+"""
+
+# Standard library imports
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+# Local imports
+from benchmarks.corpus import REPOSITORY_DIR, CorpusConfig, create_corpus
+
+# Relative slowdown of a benchmark's median, compared to the baseline, that counts as
+# a regression
+DEFAULT_THRESHOLD = 0.10
+BENCHMARKS = [
+    "parse",
+    "markdown",
+    "render",
+    "search_index",
+    "search_update",
+    "build_cold",
+    "build_warm",
+    "check_links",
+]
+# Share of the articles changed before updating the search index
+SEARCH_UPDATE_RATIO = 0.01
+
+
+def measure(function: Callable[[], object], repeat: int) -> dict[str, float]:
+    """Runs the function the given number of times and returns the timings in
+    seconds."""
+
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "max": max(timings),
+    }
+
+
+def measure_shards(directory: Path) -> dict[str, float]:
+    """Returns the number of JSON shards in the directory and their sizes in KiB."""
+
+    sizes = [filepath.stat().st_size / 1024 for filepath in directory.glob("*.json")]
+    if not sizes:
+        return {"count": 0}
+    return {
+        "count": len(sizes),
+        "total_kib": sum(sizes),
+        "median_kib": statistics.median(sizes),
+        "max_kib": max(sizes),
+    }
+
+
+def run_benchmarks(
+    project_dir: Path, repeat: int, jobs: int, selected: list[str]
+) -> tuple[dict[str, dict], dict[str, dict]]:
+    """Runs the selected benchmarks on the project and returns the timings keyed by
+    the benchmark names, along with the sizes of the search index shards if it was
+    built."""
+
+    # The generator reads 'config.json' from the current directory and caches it, so
+    # it's only imported once the project is the current directory
+    os.chdir(project_dir)
+    sys.path.insert(0, str(REPOSITORY_DIR))
+    from generator.assets import AssetPipeline
+    from generator.converter import MarkdownConverter
+    from generator.generator import Generator
+    from generator.parser import Parser
+    from generator.search import SearchIndex, extract_terms
+    from generator.templater import ArticleTemplater, Templater
+    from generator.types import SearchDocument
+
+    md_files = sorted((project_dir / "content" / "articles").rglob("*.md"))
+    parser = Parser()
+    converter = MarkdownConverter()
+    templater = ArticleTemplater()
+    # The templates link to the assets of the theme
+    Templater.enable_assets(
+        AssetPipeline(
+            project_dir / "templates" / "themes" / "default",
+            project_dir / "publish" / "assets",
+        )
+    )
+
+    results: dict[str, dict] = {}
+    shards: dict[str, dict] = {}
+    if "parse" in selected:
+        results["parse"] = measure(
+            lambda: [parser.parse(filepath) for filepath in md_files], repeat
+        )
+
+    parsed_files = [parser.parse(filepath) for filepath in md_files]
+    if "markdown" in selected:
+        results["markdown"] = measure(
+            lambda: [converter.convert(parsed["content"]) for parsed in parsed_files],
+            repeat,
+        )
+
+    for parsed in parsed_files:
+        parsed["content"] = converter.convert(parsed["content"])
+    if "render" in selected:
+        results["render"] = measure(
+            lambda: [templater.render(parsed) for parsed in parsed_files], repeat
+        )
+
+    search_dir = project_dir / "search-benchmark"
+
+    def create_document(filepath: Path, parsed: dict, extra: str = ""):
+        return SearchDocument(
+            source=filepath.as_posix(),
+            url=filepath.stem + ".html",
+            title=parsed["metadata"].get("title", filepath.stem),
+            terms=extract_terms(parsed["metadata"], parsed["content"] + extra),
+        )
+
+    def index_search():
+        shutil.rmtree(search_dir, ignore_errors=True)
+        search = SearchIndex(search_dir / "search.sqlite", search_dir / "search")
+        search.update(
+            create_document(filepath, parsed)
+            for filepath, parsed in zip(md_files, parsed_files)
+        )
+        search.write()
+        search.close()
+
+    if "search_index" in selected or "search_update" in selected:
+        results["search_index"] = measure(index_search, repeat)
+        shards["terms"] = measure_shards(search_dir / "search" / "terms")
+        shards["docs"] = measure_shards(search_dir / "search" / "docs")
+
+    if "search_update" in selected:
+        updates = [0]
+        step = max(1, round(1 / SEARCH_UPDATE_RATIO))
+
+        def update_search():
+            # Every run adds a new word to the changed articles, so that their
+            # postings differ from the indexed ones
+            updates[0] += 1
+            search = SearchIndex(search_dir / "search.sqlite", search_dir / "search")
+            search.update(
+                create_document(filepath, parsed, f" update{updates[0]}")
+                for filepath, parsed in zip(md_files[::step], parsed_files[::step])
+            )
+            search.write()
+            search.close()
+
+        results["search_update"] = measure(update_search, repeat)
+    shutil.rmtree(search_dir, ignore_errors=True)
+
+    def build_cold():
+        shutil.rmtree(project_dir / ".gen", ignore_errors=True)
+        shutil.rmtree(project_dir / "publish")
+        (project_dir / "publish").mkdir()
+        Generator(jobs=jobs).generate_all_articles()
+
+    def build_warm():
+        Generator(jobs=jobs).generate_all_articles()
+
+    if "build_cold" in selected or "build_warm" in selected:
+        results["build_cold"] = measure(build_cold, repeat)
+    if "build_warm" in selected:
+        results["build_warm"] = measure(build_warm, repeat)
+
+    if "check_links" in selected:
+        if "build_cold" not in selected:
+            build_warm()
+        results["check_links"] = measure(
+            lambda: Generator(jobs=jobs).check_links(), repeat
+        )
+
+    for timings in results.values():
+        timings["per_file_us"] = timings["median"] / max(1, len(md_files)) * 1e6
+    return results, shards
+
+
+def compare(
+    results: dict[str, dict], baseline: dict[str, dict], threshold: float
+) -> list[str]:
+    """Prints the results next to the baseline and returns the names of the
+    benchmarks that regressed beyond the threshold."""
+
+    regressions: list[str] = []
+    print(f"\n{'benchmark':<12} {'median':>10} {'baseline':>10} {'change':>8}")
+    for name, timings in results.items():
+        median = timings["median"]
+        if name not in baseline:
+            print(f"{name:<12} {median * 1000:>8.1f}ms {'-':>10} {'-':>8}")
+            continue
+        baseline_median = baseline[name]["median"]
+        change = median / baseline_median - 1
+        marker = ""
+        if change > threshold:
+            regressions.append(name)
+            marker = "  REGRESSION"
+        print(
+            f"{name:<12} {median * 1000:>8.1f}ms {baseline_median * 1000:>8.1f}ms"
+            f" {change:>+8.1%}{marker}"
+        )
+    return regressions
+
+
+def main():
+
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--articles", type=int, default=1000)
+    arg_parser.add_argument("--pages", type=int, default=10)
+    arg_parser.add_argument("--body-size", type=int, default=4000)
+    arg_parser.add_argument("--metadata-size", type=int, default=4)
+    arg_parser.add_argument("--depth", type=int, default=2)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    arg_parser.add_argument("--jobs", type=int, default=1)
+    arg_parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        choices=BENCHMARKS,
+        default=BENCHMARKS,
+        help="benchmarks to run, all of them by default",
+    )
+    arg_parser.add_argument(
+        "--output", type=Path, help="file the results are saved to as JSON"
+    )
+    arg_parser.add_argument("--baseline", type=Path, help="results to compare to")
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative slowdown that counts as a regression",
+    )
+    arg_parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="save the results as the new baseline instead of comparing",
+    )
+    args = arg_parser.parse_args()
+
+    config = CorpusConfig(
+        articles=args.articles,
+        pages=args.pages,
+        body_size=args.body_size,
+        metadata_size=args.metadata_size,
+        depth=args.depth,
+        seed=args.seed,
+    )
+    # Resolving the paths before the benchmarks change the current directory
+    output = args.output.absolute() if args.output else None
+    baseline_fp = args.baseline.absolute() if args.baseline else None
+
+    with tempfile.TemporaryDirectory(prefix="gen-benchmark-") as temp_dir:
+        project_dir = create_corpus(Path(temp_dir) / "project", config)
+        results, shards = run_benchmarks(
+            project_dir, args.repeat, args.jobs, args.benchmarks
+        )
+        os.chdir(REPOSITORY_DIR)
+
+    report = {
+        "corpus": config._asdict(),
+        "jobs": args.jobs,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+        "search_shards": shards,
+    }
+    if output:
+        output.write_text(json.dumps(report, indent=2))
+
+    if baseline_fp and args.update_baseline:
+        baseline_fp.write_text(json.dumps(report, indent=2))
+        print(f"Saved the baseline to '{baseline_fp}'")
+        return
+
+    baseline: dict[str, dict] = {}
+    if baseline_fp and baseline_fp.exists():
+        stored = json.loads(baseline_fp.read_text())
+        if stored["corpus"] != report["corpus"]:
+            print("Warning: the baseline was recorded on a different corpus")
+        baseline = stored["results"]
+
+    for kind, sizes in shards.items():
+        if sizes["count"]:
+            print(
+                f"search {kind}: {sizes['count']} shards, {sizes['total_kib']:.0f} KiB"
+                f" in total, median {sizes['median_kib']:.1f} KiB,"
+                f" largest {sizes['max_kib']:.1f} KiB"
+            )
+
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        sys.exit(f"\nRegressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+
+    main()
@@ -1,14 +1,18 @@
 # Standard library imports
+import os
 import time
+from pathlib import Path
 
 # External library imports
 import typer
 
 # Local imports
+# The generator and the server pull in Jinja2 and Markdown, so they're only
+# imported by the commands that need them
 from helpers import get_config
 from builder.builder import Builder
-from generator.generator import Generator
 from generator import exceptions as gen_exceptions
+from generator.types import BrokenReference
 from builder.exceptions import NoTemplateDirectoryFound, ProjectDirectoryNotFound
 
 app = typer.Typer()
@@ -39,34 +43,298 @@ def initialize_project(filepath: str = "."):
 
 @app.command("make")
 def generate_sites(
-    filename: str = "",
-    articles: bool = typer.Option(default=False),
-    pages: bool = typer.Option(default=False),
+    filename: str = typer.Argument(
+        default="", help="Markdown file or directory to build instead of the whole site."
+    ),
+    articles: bool = typer.Option(default=False, help="Only build the articles."),
+    pages: bool = typer.Option(default=False, help="Only build the pages."),
+    full: bool = typer.Option(
+        default=False, help="Rebuild every file even if its inputs haven't changed."
+    ),
+    jobs: int = typer.Option(
+        default=1, help="Number of processes used to generate the files."
+    ),
+    pipeline: bool = typer.Option(
+        default=False,
+        help="Read and write files on background threads while rendering.",
+    ),
+    minify: bool = typer.Option(default=False, help="Minify the generated HTML files."),
+    compress: bool = typer.Option(
+        default=False,
+        help="Save gzipped copies of the HTML, CSS and JS files next to them.",
+    ),
+    staging: bool = typer.Option(
+        default=False,
+        help="Build into a copy of 'publish' and swap it in once the build is done.",
+    ),
+    shard: str = typer.Option(
+        default="",
+        help="Only build the K-th of N shards of the site, given as 'K/N'.",
+    ),
+    out: str = typer.Option(
+        default="", help="Directory the site is saved to instead of 'publish'."
+    ),
+    target: list[str] = typer.Option(
+        default=[],
+        help="Build the site with a theme into a directory, given as "
+        "'theme:publish_dir', instead of into 'publish'. Can be repeated to build "
+        "several targets while parsing the sources once.",
+    ),
+    check: bool = typer.Option(
+        default=False,
+        help="Check the links and asset references of the files built in this run.",
+    ),
+    profile: bool = typer.Option(
+        default=False, help="Report the time spent in each stage and the slowest files."
+    ),
+    profile_slowest: int = typer.Option(
+        default=10, help="Number of slowest files listed in the profile report."
+    ),
+    profile_output: str = typer.Option(
+        default="", help="Save the profile as a Chrome trace (JSON) to this file."
+    ),
 ):
 
-    # TODO: Add support for making only articles or only pages or both.
-    processed_articles = processed_pages = 0
+    # Building both when neither or both are specified
+    subdirectory = ""
+    if articles == pages:
+        articles = pages = True
+    else:
+        subdirectory = "articles" if articles else "pages"
+
+    from generator.generator import Generator
+    from generator.shards import parse_shard
+    from generator.targets import parse_targets
+
+    if shard and not out:
+        # The shard's state would otherwise be published along with the site
+        typer.secho(
+            "\n'--shard' needs '--out', the directory to build the shard into",
+            fg="red",
+        )
+        return
+    if shard and staging:
+        typer.secho("\n'--shard' can't be combined with '--staging'", fg="red")
+        return
+    if shard and check:
+        typer.secho("\n'--shard' can't be combined with '--check'", fg="red")
+        return
+    if target and (shard or staging or out):
+        typer.secho(
+            "\n'--target' can't be combined with '--shard', '--staging' or '--out'",
+            fg="red",
+        )
+        return
+
+    processed_articles = processed_pages = processed_files = skipped_files = 0
+    generated_listings = generated_feeds = pruned_assets = 0
     start_time = time.time()
-    if not filename:
-        try:
-            generator = Generator()
-            processed_articles = generator.generate_all_articles()
-            processed_pages = generator.generate_all_pages()
-        except gen_exceptions.ConfigNotFound:
-            typer.secho(
-                "\n'config.json' not found. Please make sure to run the command from the root of the directory",
-                fg="red",
+    try:
+        targets = parse_targets(target)
+        theme, publish_dir = targets[0] if targets else (None, None)
+        generator = Generator(
+            theme,
+            targets=targets[1:],
+            publish_dir=publish_dir or (Path(out).absolute() if out else None),
+            shard=parse_shard(shard) if shard else None,
+            full=full,
+            jobs=jobs,
+            pipeline=pipeline,
+            profile=profile or bool(profile_output),
+            minify=minify,
+            staging=staging,
+        )
+        if filename:
+            processed_files = generator.generate_path(
+                Path(filename), subdirectory=subdirectory
             )
-            return
-        except gen_exceptions.InvalidConfig as e:
-            typer.secho("\nInvalid config", fg="red")
-            typer.secho(e.error)
-            return
+        else:
+            if articles:
+                processed_articles = generator.generate_all_articles()
+            if pages:
+                processed_pages = generator.generate_all_pages()
+            # Outputs that weren't built may still link to earlier versions
+            if articles and pages:
+                pruned_assets = generator.prune_assets()
+        generated_feeds = generator.generate_feeds()
+        if compress:
+            compress_stats = generator.precompress()
+        generator.publish()
+        if check:
+            broken_references = generator.check_links(changed_only=True)
+        skipped_files = generator.total_skipped_files
+        generated_listings = generator.generated_listings
+    except gen_exceptions.ConfigNotFound:
+        typer.secho(
+            "\n'config.json' not found. Please make sure to run the command from the root of the directory",
+            fg="red",
+        )
+        return
+    except FileNotFoundError as e:
+        _report_missing_file(e)
+        return
+    except gen_exceptions.InvalidConfig as e:
+        typer.secho("\nInvalid config", fg="red")
+        typer.secho(e.error)
+        return
+    except gen_exceptions.ContentNotFound:
+        typer.secho(f"\nCouldn't find '{filename}'", fg="red")
+        return
+    except gen_exceptions.NotInContentDirectory:
+        typer.secho(f"\n'{filename}' is not within the 'content' directory", fg="red")
+        return
+    except gen_exceptions.NotInSubdirectory as e:
+        typer.secho(
+            f"\n'{filename}' is not within the 'content/{e}' directory", fg="red"
+        )
+        return
+    except gen_exceptions.InvalidTarget as e:
+        typer.secho(
+            f"\nInvalid target '{e}', expected 'theme:publish_dir' with a different"
+            " directory for every target",
+            fg="red",
+        )
+        return
+    except gen_exceptions.InvalidShard:
+        typer.secho(
+            f"\nInvalid shard '{shard}', expected 'K/N' with 1 <= K <= N", fg="red"
+        )
+        return
+    except gen_exceptions.AssetNotFound as e:
+        typer.secho(f"\nCouldn't find the asset '{e}' in the theme", fg="red")
+        return
     end_time = time.time()
     total_time = end_time - start_time
+    if filename:
+        typer.secho(f"\nProcessed {processed_files} files in {total_time:.3f} seconds.")
+    else:
+        typer.secho(
+            f"\nProcessed {processed_articles} articles and {processed_pages} pages in {total_time:.3f} seconds.",
+        )
+    if skipped_files:
+        typer.secho(f"Skipped {skipped_files} unchanged files.")
+    if generated_listings:
+        typer.secho(f"Generated {generated_listings} listing pages.")
+    if generated_feeds:
+        typer.secho(f"Updated {generated_feeds} sitemap and feed files.")
+    if pruned_assets:
+        typer.secho(f"Removed {pruned_assets} superseded assets.")
+    if compress:
+        typer.secho(
+            f"Compressed {compress_stats.compressed} files"
+            f" ({compress_stats.skipped} up to date)."
+        )
+
+    if profile:
+        generator.profiler.print_report(profile_slowest)
+    if profile_output:
+        generator.profiler.save_trace(Path(profile_output))
+        typer.secho(f"\nSaved the profile to '{profile_output}'")
+    if check:
+        _report_broken_references(broken_references)
+
+
+@app.command("check")
+def check_links(
+    jobs: int = typer.Option(
+        default=os.cpu_count() or 1,
+        help="Number of processes used to check the files.",
+    ),
+    out: str = typer.Option(
+        default="", help="Directory to check instead of 'publish'."
+    ),
+):
+    """Checks the publish directory for links to pages and references to assets
+    that don't exist."""
+
+    from generator.generator import Generator
+
+    if out and not Path(out).is_dir():
+        typer.secho(f"\nCouldn't find '{out}'", fg="red")
+        return
+
+    start_time = time.time()
+    try:
+        generator = Generator(
+            publish_dir=Path(out).absolute() if out else None, jobs=jobs
+        )
+        broken_references = generator.check_links()
+    except FileNotFoundError as e:
+        _report_missing_file(e)
+        return
+    except gen_exceptions.InvalidConfig as e:
+        typer.secho("\nInvalid config", fg="red")
+        typer.secho(e.error)
+        return
+
+    total_time = time.time() - start_time
+    typer.secho(f"\nChecked the site in {total_time:.3f} seconds.")
+    _report_broken_references(broken_references)
+
+
+@app.command("merge")
+def merge_shards(
+    directories: list[str] = typer.Argument(
+        ..., help="Output directories of the shards built with 'gen make --shard'."
+    ),
+):
+    """Combines the outputs of sharded builds into the publish directory and
+    generates the pages that span the whole site."""
+
+    from generator.generator import Generator
+
+    start_time = time.time()
+    try:
+        generator = Generator()
+        merged_files = generator.merge([Path(directory) for directory in directories])
+    except FileNotFoundError as e:
+        _report_missing_file(e)
+        return
+    except gen_exceptions.InvalidConfig as e:
+        typer.secho("\nInvalid config", fg="red")
+        typer.secho(e.error)
+        return
+    except gen_exceptions.NotAShard as e:
+        typer.secho(f"\n'{e}' is not the output of a shard", fg="red")
+        return
+    except gen_exceptions.AssetNotFound as e:
+        typer.secho(f"\nCouldn't find the asset '{e}' in the theme", fg="red")
+        return
+    except gen_exceptions.IncompleteShards as e:
+        typer.secho(
+            f"\nThe shards {e} aren't every shard of one build, so nothing was merged",
+            fg="red",
+        )
+        return
+
+    total_time = time.time() - start_time
     typer.secho(
-        f"\nProcessed {processed_articles} articles and {processed_pages} pages in {total_time:.3f} seconds.",
+        f"\nMerged {len(directories)} shards with {merged_files} files in {total_time:.3f} seconds."
     )
+    if generator.generated_listings:
+        typer.secho(f"Generated {generator.generated_listings} listing pages.")
+    if generator.generated_feeds:
+        typer.secho(f"Updated {generator.generated_feeds} sitemap and feed files.")
+
+
+@app.command("serve")
+def serve_sites(
+    host: str = "",
+    port: int = typer.Option(default=8000),
+):
+    """Serves the site from memory and rebuilds files as they change."""
+
+    from server.dev_server import serve
+
+    try:
+        serve(host, port)
+    except FileNotFoundError as e:
+        _report_missing_file(e)
+    except gen_exceptions.InvalidConfig as e:
+        typer.secho("\nInvalid config", fg="red")
+        typer.secho(e.error)
+    except gen_exceptions.AssetNotFound as e:
+        typer.secho(f"\nCouldn't find the asset '{e}' in the theme", fg="red")
 
 
 @app.command("update")
@@ -80,6 +348,10 @@ def update_directory(directory: str):
             fg="red",
         )
         return
+    except gen_exceptions.InvalidConfig as e:
+        typer.secho("\nInvalid config", fg="red")
+        typer.secho(e.error)
+        return
 
     if "project_directory" not in config:
         typer.secho("\n'project_directory' missing in 'config.json'", fg="red")
@@ -99,6 +371,42 @@ def update_directory(directory: str):
     typer.secho(f"\nUpdated '{directory}' successfully!", fg="green")
 
 
+def _report_missing_file(error: FileNotFoundError):
+    """Tells which file or directory of the project is missing. Only a missing
+    'config.json' means the command wasn't run from the root of the project."""
+
+    if error.filename is not None and Path(error.filename).name == "config.json":
+        typer.secho(
+            "\n'config.json' not found. Please make sure to run the command from the root of the directory",
+            fg="red",
+        )
+    elif error.filename is not None:
+        typer.secho(f"\n'{error.filename}' not found", fg="red")
+    else:
+        typer.secho(f"\n{error}", fg="red")
+
+
+def _report_broken_references(broken_references: list[BrokenReference]):
+    """Lists the broken references by file and exits with a failure status if
+    there are any."""
+
+    if not broken_references:
+        typer.secho("No broken links or missing assets found.", fg="green")
+        return
+
+    links = sum(1 for reference in broken_references if reference.kind == "link")
+    assets = len(broken_references) - links
+    typer.secho(
+        f"\nFound {links} dangling links and {assets} missing assets:\n", fg="red"
+    )
+    for reference in broken_references:
+        kind = "dangling link" if reference.kind == "link" else "missing asset"
+        typer.secho(
+            f"{reference.source}:{reference.line}: {kind} '{reference.reference}'"
+        )
+    raise typer.Exit(code=1)
+
+
 if __name__ == "__main__":
 
     app()
@@ -0,0 +1,179 @@
+# Standard library imports
+import re
+import hashlib
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Local imports
+from generator import exceptions
+from generator.publish import write_atomic
+
+
+# ----- CONSTANTS -----
+
+# Number of hex digits of the content hash kept in the names of the assets
+HASH_LENGTH = 12
+CSS_STRING = r"""("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')"""
+CSS_STRING_OR_COMMENT = re.compile(CSS_STRING + r"|/\*.*?\*/", re.DOTALL)
+CSS_WHITESPACE = re.compile(r"\s+")
+CSS_PUNCTUATION = re.compile(r"\s*([{};,>])\s*")
+# The colon of a declaration: a property name that follows '{' or ';' and is followed
+# by a value that ends at ';' or '}' rather than by the '{' of a rule, since a space
+# before a colon in a selector ('a :hover') is a descendant combinator
+CSS_DECLARATION = re.compile(CSS_STRING + r"|([{;][-\w]+) ?: ?(?=[^{};]*[;}])")
+FINGERPRINTED_NAME = re.compile(rf".+\.[0-9a-f]{{{HASH_LENGTH}}}\.[A-Za-z0-9]+")
+
+
+class AssetPipeline:
+    """Publishes the files of the theme under names that contain the hash of their
+    contents, so that they can be cached by browsers and CDNs for as long as they
+    like. CSS files are minified and several files can be bundled into one.
+
+    Assets are built the first time a template asks for them and an asset that's
+    already in the output directory is never written again, since its name changes
+    whenever its contents do. Earlier versions are kept until they're pruned."""
+
+    def __init__(self, source_dir: Path, output_dir: Path):
+
+        self._source_dir: Path = source_dir
+        self._output_dir: Path = output_dir
+        self._names: dict[tuple[str, ...], str] = {}
+        self._file_digests: dict[str, str] = {}
+        self._theme_digest: Optional[str] = None
+
+    def publish(self, *sources: str) -> str:
+        """Builds the asset from the given files of the theme, bundled in the given
+        order, and returns its name within the output directory. Raises AssetNotFound
+        if one of the files doesn't exist."""
+
+        if sources not in self._names:
+            self._names[sources] = self._build(sources)
+        return self._names[sources]
+
+    def digest(self, calls: Optional[Iterable[tuple[str, ...]]]) -> str:
+        """Returns a hex digest that changes whenever the name of the asset of any of
+        the given calls, i.e. the files passed to `asset()`, might. Only those files
+        are read. If the calls aren't known, the digest covers the names, sizes and
+        modification times of every file of the theme instead."""
+
+        if calls is None:
+            return self._get_theme_digest()
+
+        hasher = hashlib.sha256()
+        for sources in sorted(calls):
+            for source in sources:
+                hasher.update(source.encode("utf-8"))
+                hasher.update(self._get_file_digest(source).encode("utf-8"))
+            hasher.update(b"\0")
+        return hasher.hexdigest()
+
+    def prune(self, calls: Iterable[tuple[str, ...]]) -> int:
+        """Removes the assets, along with their compressed copies, that aren't built
+        by any of the given calls anymore, e.g. earlier versions of edited
+        stylesheets. Only assets this pipeline could have built are removed. Returns
+        the number of removed assets."""
+
+        current: set[str] = set()
+        for sources in calls:
+            try:
+                current.add(self.publish(*sources))
+            except exceptions.AssetNotFound:
+                continue
+
+        if not self._output_dir.is_dir():
+            return 0
+        removed = 0
+        for filepath in self._output_dir.iterdir():
+            if filepath.name in current or not FINGERPRINTED_NAME.fullmatch(
+                filepath.name
+            ):
+                continue
+            filepath.unlink()
+            filepath.with_name(filepath.name + ".gz").unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def clear(self):
+        """Forgets the built assets so that edited theme files are read again."""
+
+        self._names = {}
+        self._file_digests = {}
+        self._theme_digest = None
+
+    # ----- HELPER METHODS -----
+    def _get_file_digest(self, source: str) -> str:
+        """Returns the hex digest of the contents of a file of the theme."""
+
+        if source not in self._file_digests:
+            try:
+                content = (self._source_dir / source).read_bytes()
+            except (FileNotFoundError, IsADirectoryError):
+                # Rendering fails with AssetNotFound until the file exists
+                content = b""
+            self._file_digests[source] = hashlib.sha256(content).hexdigest()
+        return self._file_digests[source]
+
+    def _get_theme_digest(self) -> str:
+        """Returns the hex digest of the names, sizes and modification times of
+        every file of the theme, without reading them."""
+
+        if self._theme_digest is None:
+            hasher = hashlib.sha256()
+            for filepath in sorted(self._source_dir.rglob("*")):
+                if not filepath.is_file():
+                    continue
+                stat = filepath.stat()
+                name = filepath.relative_to(self._source_dir).as_posix()
+                hasher.update(
+                    f"{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode("utf-8")
+                )
+            self._theme_digest = hasher.hexdigest()
+        return self._theme_digest
+
+    def _build(self, sources: tuple[str, ...]) -> str:
+        """Bundles and minifies the files, saves the result unless it already exists
+        and returns its name."""
+
+        filepaths = [self._source_dir / source for source in sources]
+        for source, filepath in zip(sources, filepaths):
+            if not filepath.is_file():
+                raise exceptions.AssetNotFound(source)
+        suffixes = {filepath.suffix for filepath in filepaths}
+        if len(suffixes) != 1:
+            raise exceptions.AssetNotFound(
+                f"{', '.join(sources)} (bundled files must be of the same type)"
+            )
+        suffix = suffixes.pop()
+
+        if suffix == ".css":
+            content = "\n".join(
+                minify_css(filepath.read_text()) for filepath in filepaths
+            ).encode("utf-8")
+        else:
+            content = b"".join(filepath.read_bytes() for filepath in filepaths)
+
+        digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+        stem = filepaths[0].stem if len(filepaths) == 1 else "bundle"
+        name = f"{stem}.{digest}{suffix}"
+        output_fp = self._output_dir / name
+        if not output_fp.exists():
+            # Written atomically since worker processes may build the same asset
+            self._output_dir.mkdir(parents=True, exist_ok=True)
+            write_atomic(output_fp, content)
+        return name
+
+
+def minify_css(css: str) -> str:
+    """Removes the comments and the whitespace that doesn't change the meaning of the
+    stylesheet. Strings are left untouched."""
+
+    css = CSS_STRING_OR_COMMENT.sub(lambda match: match.group(1) or " ", css)
+    parts = re.split(CSS_STRING, css)
+    for index in range(0, len(parts), 2):
+        part = CSS_WHITESPACE.sub(" ", parts[index])
+        part = CSS_PUNCTUATION.sub(r"\1", part)
+        parts[index] = part.replace(";}", "}")
+    return CSS_DECLARATION.sub(
+        lambda match: match.group(2) + ":" if match.group(2) else match.group(1),
+        "".join(parts).strip(),
+    )
@@ -0,0 +1,176 @@
+# Standard library imports
+import os
+import posixpath
+from pathlib import Path
+from html.parser import HTMLParser
+from typing import Iterable, Optional
+from urllib.parse import unquote, urlsplit
+from concurrent.futures import ProcessPoolExecutor
+
+# Local imports
+from generator.types import BrokenReference
+
+
+# ----- CONSTANTS -----
+
+HTML_EXTENSIONS = (".html", ".htm")
+# Tags whose references are navigated to rather than loaded along with the page
+LINK_TAGS = frozenset(["a", "area"])
+REFERENCE_ATTRIBUTES = frozenset(["href", "src", "srcset", "poster", "data"])
+# Size of the chunks an HTML file is fed to the parser in
+READ_SIZE = 64 * 1024
+
+
+class LinkChecker:
+    """Checks the internal references of the HTML files in a directory.
+
+    Every file in the directory is listed once up front, so resolving a reference is
+    a set lookup rather than a stat. The HTML files are streamed through a parser that
+    only looks at the attributes referring to other files, spread across a pool of
+    worker processes. Links (`<a href>`) to missing files are reported as dangling
+    links and other references (stylesheets, scripts, images etc.) as missing assets.
+    External URLs and fragments are never checked."""
+
+    def __init__(self, directory: Path):
+
+        self._directory: Path = directory
+        self._files: set[str] = set()
+        self._directories: set[str] = set()
+        for dirpath, dirnames, filenames in os.walk(directory):
+            relative_dir = Path(dirpath).relative_to(directory).as_posix()
+            prefix = "" if relative_dir == "." else relative_dir + "/"
+            self._directories.update(prefix + dirname for dirname in dirnames)
+            self._files.update(prefix + filename for filename in filenames)
+
+    def html_files(self) -> list[str]:
+        """Returns the HTML files in the directory, relative to it."""
+
+        return sorted(path for path in self._files if path.endswith(HTML_EXTENSIONS))
+
+    def check(
+        self, outputs: Optional[Iterable[str]] = None, *, jobs: int = 1
+    ) -> list[BrokenReference]:
+        """Checks the given HTML files, relative to the directory, or every HTML file
+        in it. Files that don't exist are skipped. Returns the broken references
+        ordered by file and line."""
+
+        if outputs is None:
+            html_files = self.html_files()
+        else:
+            html_files = sorted(
+                output
+                for output in set(outputs)
+                if output in self._files and output.endswith(HTML_EXTENSIONS)
+            )
+
+        if jobs > 1 and len(html_files) > 1:
+            jobs = min(jobs, len(html_files))
+            # Large chunks keep the inter-process overhead low while still leaving a
+            # few chunks per worker to balance files of different sizes
+            chunksize = max(1, len(html_files) // (jobs * 4))
+            with ProcessPoolExecutor(
+                max_workers=jobs,
+                initializer=_init_worker,
+                initargs=(self,),
+            ) as executor:
+                results = executor.map(
+                    _check_in_worker, html_files, chunksize=chunksize
+                )
+                broken = [reference for result in results for reference in result]
+        else:
+            broken = [
+                reference
+                for html_file in html_files
+                for reference in self.check_file(html_file)
+            ]
+
+        return broken
+
+    def check_file(self, html_file: str) -> list[BrokenReference]:
+        """Returns the broken references of a single HTML file, relative to the
+        directory."""
+
+        parser = _ReferenceParser()
+        with open(
+            self._directory / html_file, "r", encoding="utf-8", errors="replace"
+        ) as f:
+            for chunk in iter(lambda: f.read(READ_SIZE), ""):
+                parser.feed(chunk)
+        parser.close()
+
+        base_dir = posixpath.dirname(html_file)
+        broken: list[BrokenReference] = []
+        for tag, reference, line in parser.references:
+            if self._resolves(base_dir, reference):
+                continue
+            kind = "link" if tag in LINK_TAGS else "asset"
+            broken.append(BrokenReference(html_file, line, reference, kind))
+        return broken
+
+    # ----- HELPER METHODS -----
+    def _resolves(self, base_dir: str, reference: str) -> bool:
+        """Checks whether the reference, made from a file in the base directory,
+        points to an existing file. References that aren't internal always do."""
+
+        parts = urlsplit(reference.strip())
+        if parts.scheme or parts.netloc or not parts.path:
+            return True
+
+        path = unquote(parts.path)
+        # Like browsers, '..' segments going above the root of the site stay at it
+        target = posixpath.normpath(posixpath.join("/", base_dir, path)).lstrip("/")
+        if not target or path.endswith("/") or target in self._directories:
+            index = f"{target}/index.html" if target else "index.html"
+            return index in self._files
+        return target in self._files
+
+
+class _ReferenceParser(HTMLParser):
+    """Collects the references to other files in the attributes of the tags, along
+    with the tags and the lines they're on."""
+
+    def __init__(self):
+
+        super().__init__(convert_charrefs=True)
+        self.references: list[tuple[str, str, int]] = []
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, Optional[str]]]):
+
+        for name, value in attrs:
+            if name not in REFERENCE_ATTRIBUTES or not value:
+                continue
+            # The object tag's 'data' is a URL, but other tags don't have one
+            if name == "data" and tag != "object":
+                continue
+            line = self.getpos()[0]
+            if name == "srcset":
+                for candidate in value.split(","):
+                    url = candidate.strip().split(" ")[0]
+                    if url:
+                        self.references.append((tag, url, line))
+            else:
+                self.references.append((tag, value, line))
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, Optional[str]]]):
+
+        self.handle_starttag(tag, attrs)
+
+
+# ----- WORKER PROCESSES -----
+
+# The checker owned by a worker process of the pool used for parallel checks
+_worker_checker: Optional[LinkChecker] = None
+
+
+def _init_worker(checker: LinkChecker):
+    """Receives the listing of the directory once per worker process."""
+
+    global _worker_checker
+    _worker_checker = checker
+
+
+def _check_in_worker(html_file: str) -> list[BrokenReference]:
+
+    checker = _worker_checker
+    assert checker is not None, "worker was not initialized"
+    return checker.check_file(html_file)
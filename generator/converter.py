@@ -0,0 +1,137 @@
+# Standard library imports
+import os
+import json
+import hashlib
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+# External library imports
+import markdown
+
+
+# ----- CONSTANTS -----
+
+# Extensions passed to markdown. These are part of the cache key so that changing
+# them invalidates the cached HTML.
+MARKDOWN_EXTENSIONS: list[str] = []
+
+
+class MarkdownCache:
+    """Content addressed on-disk cache of the HTML converted from markdown.
+
+    The modification time of an entry is bumped whenever it's used, which lets
+    `evict` drop the least recently used entries once the cache outgrows its size cap."""
+
+    DEFAULT_MAX_SIZE: int = 256 * 1024 * 1024
+
+    def __init__(self, directory: Path, max_size: int = DEFAULT_MAX_SIZE):
+
+        self._directory: Path = directory
+        self._max_size: int = max_size
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached HTML stored under the key, if any."""
+
+        fp = self._get_path(key)
+        try:
+            with open(fp, "r", encoding="utf-8") as f:
+                html = f.read()
+        except FileNotFoundError:
+            return None
+
+        # Marking the entry as recently used
+        try:
+            os.utime(fp)
+        except FileNotFoundError:  # Evicted by another build in the meantime
+            pass
+        return html
+
+    def set(self, key: str, html: str):
+        """Stores the HTML under the key. The entry is written to a temporary file and
+        renamed so that concurrent builds never read a partially written entry."""
+
+        fp = self._get_path(key)
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_fp = tempfile.mkstemp(dir=fp.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(html)
+        os.replace(temp_fp, fp)
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits its size cap."""
+
+        if not self._directory.exists():
+            return
+
+        entries: list[tuple[float, int, str]] = []
+        total_size = 0
+        for shard in os.scandir(self._directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        if total_size <= self._max_size:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            if total_size <= self._max_size:
+                break
+
+    def _get_path(self, key: str) -> Path:
+        """Returns the path of the entry. Entries are spread over subdirectories so
+        that no single directory grows too large."""
+
+        return self._directory / key[:2] / (key + ".html")
+
+
+class MarkdownConverter:
+    """Converts markdown to HTML, reusing previously converted HTML from the cache
+    when the same content was converted before.
+
+    A single markdown parser is set up per converter and reset between documents,
+    instead of building a new parser for every file."""
+
+    def __init__(self, cache: Optional[MarkdownCache] = None):
+
+        self._cache: Optional[MarkdownCache] = cache
+        self._markdown: markdown.Markdown = markdown.Markdown(
+            extensions=MARKDOWN_EXTENSIONS
+        )
+        self._config_key: str = json.dumps(
+            {"version": markdown.__version__, "extensions": MARKDOWN_EXTENSIONS}
+        )
+
+    def convert(self, content: str) -> str:
+        """Returns the HTML for the markdown content."""
+
+        if self._cache is None:
+            return self._convert(content)
+
+        key = self._get_key(content)
+        html = self._cache.get(key)
+        if html is None:
+            html = self._convert(content)
+            self._cache.set(key, html)
+        return html
+
+    def _convert(self, content: str) -> str:
+        """Converts the content with the reusable markdown parser."""
+
+        return self._markdown.reset().convert(content)
+
+    def _get_key(self, content: str) -> str:
+        """Returns the cache key for the content under the current markdown config."""
+
+        digest = hashlib.sha256(self._config_key.encode("utf-8"))
+        digest.update(content.encode("utf-8"))
+        return digest.hexdigest()
@@ -0,0 +1,150 @@
+# Standard library imports
+import hashlib
+from typing import Optional
+
+# External library imports
+from jinja2 import Environment, meta, nodes
+
+
+class TemplateDependencies:
+    """Resolves the templates a template depends on through its `extends`, `include`
+    and `import` tags and fingerprints them so that template edits can be detected.
+
+    Results are memoized, so an instance should only live for the duration of a build
+    or be cleared once templates were edited."""
+
+    def __init__(self, env: Environment):
+
+        self._env: Environment = env
+        self._sources: dict[str, str] = {}
+        self._references: dict[str, set[str]] = {}
+        self._variables: dict[str, set[str]] = {}
+        self._asset_calls: dict[str, Optional[set[tuple[str, ...]]]] = {}
+
+    def clear(self):
+        """Forgets the memoized templates so that edited templates are read again."""
+
+        self._sources = {}
+        self._references = {}
+        self._variables = {}
+        self._asset_calls = {}
+
+    def dependencies(self, name: str) -> set[str]:
+        """Returns the template along with every template it depends on, directly or
+        through other templates."""
+
+        dependencies: set[str] = set()
+        pending = [name]
+        while pending:
+            template = pending.pop()
+            if template in dependencies:
+                continue
+            dependencies.add(template)
+            pending.extend(self._get_references(template))
+
+        return dependencies
+
+    def fingerprint(self, name: str) -> dict[str, str]:
+        """Returns the digests of the template and all of its dependencies, keyed by
+        the template names."""
+
+        return {
+            template: self._digest(template)
+            for template in sorted(self.dependencies(name))
+        }
+
+    def uses(self, name: str, variable: str) -> bool:
+        """Checks whether the template, or any template it depends on, refers to the
+        variable or global (e.g. a helper function)."""
+
+        return any(
+            variable in self._get_variables(template)
+            for template in self.dependencies(name)
+        )
+
+    def asset_calls(self, name: str) -> Optional[set[tuple[str, ...]]]:
+        """Returns the files passed to the `asset()` calls of the template and of every
+        template it depends on, one tuple per call. Returns None if the files of a
+        call are only known at render time, e.g. `{{ asset(stylesheet) }}`."""
+
+        calls: set[tuple[str, ...]] = set()
+        for template in self.dependencies(name):
+            template_calls = self._get_asset_calls(template)
+            if template_calls is None:
+                return None
+            calls |= template_calls
+        return calls
+
+    def _get_references(self, name: str) -> set[str]:
+        """Returns the templates directly referenced by the template. References that
+        are only known at render time (e.g. `{% include some_variable %}`) can't be
+        resolved and are ignored."""
+
+        if name not in self._references:
+            ast = self._env.parse(self._get_source(name))
+            self._references[name] = {
+                reference
+                for reference in meta.find_referenced_templates(ast)
+                if reference is not None
+            }
+        return self._references[name]
+
+    def _get_variables(self, name: str) -> set[str]:
+        """Returns the names of the variables and globals the template reads. Unlike
+        `meta.find_undeclared_variables`, globals of the environment are included."""
+
+        if name not in self._variables:
+            ast = self._env.parse(self._get_source(name))
+            self._variables[name] = {
+                node.name for node in ast.find_all(nodes.Name) if node.ctx == "load"
+            }
+        return self._variables[name]
+
+    def _get_asset_calls(self, name: str) -> Optional[set[tuple[str, ...]]]:
+        """Returns the files passed to the `asset()` calls of the template itself, or
+        None if any of them isn't a string literal or the helper is used in any other
+        way than being called, e.g. passed to a macro."""
+
+        if name not in self._asset_calls:
+            ast = self._env.parse(self._get_source(name))
+            call_nodes = [
+                node
+                for node in ast.find_all(nodes.Call)
+                if isinstance(node.node, nodes.Name) and node.node.name == "asset"
+            ]
+            references = [
+                node for node in ast.find_all(nodes.Name) if node.name == "asset"
+            ]
+            if len(references) == len(call_nodes) and all(
+                self._is_static_call(node) for node in call_nodes
+            ):
+                self._asset_calls[name] = {
+                    tuple(arg.value for arg in node.args) for node in call_nodes
+                }
+            else:
+                self._asset_calls[name] = None
+        return self._asset_calls[name]
+
+    def _is_static_call(self, node: nodes.Call) -> bool:
+        """Checks whether the call only passes string literals."""
+
+        if node.kwargs or node.dyn_args or node.dyn_kwargs:
+            return False
+        return all(
+            isinstance(arg, nodes.Const) and isinstance(arg.value, str)
+            for arg in node.args
+        )
+
+    def _get_source(self, name: str) -> str:
+        """Returns the source of the template as found by the environment's loader."""
+
+        if name not in self._sources:
+            assert self._env.loader is not None, "environment has no loader"
+            source, _, _ = self._env.loader.get_source(self._env, name)
+            self._sources[name] = source
+        return self._sources[name]
+
+    def _digest(self, name: str) -> str:
+        """Returns the hex digest of the template source."""
+
+        return hashlib.sha256(self._get_source(name).encode("utf-8")).hexdigest()
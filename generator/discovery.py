@@ -0,0 +1,180 @@
+# Standard library imports
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from fnmatch import fnmatchcase
+from typing import Iterator
+
+# Local imports
+from generator.publish import write_atomic
+from generator.types import CachedDirectory
+
+
+# ----- CONSTANTS -----
+
+IGNORE_FILENAME = ".genignore"
+# Hidden files and directories, drafts and directories that hold assets rather than
+# content are never searched. Patterns ending with '/' only match directories.
+DEFAULT_IGNORE_PATTERNS = [
+    ".*",
+    "drafts/",
+    "_drafts/",
+    "assets/",
+    "images/",
+    "static/",
+    "node_modules/",
+]
+# Directories modified this recently aren't cached, since another change within the
+# resolution of the modification time would go unnoticed
+RACY_WINDOW_NS = 2 * 10**9
+
+
+class ContentDiscovery:
+    """Finds the markdown files in the content directories.
+
+    The directories are walked with `os.scandir` and the files are yielded as they're
+    found. Files and directories matching the patterns in the `.genignore` file of the
+    project, or the default patterns, are skipped and ignored directories are never
+    entered. The listing of every directory is cached along with its modification
+    time, which only changes when entries are added, removed or renamed, so unchanged
+    directories are only stat'ed instead of listed on later builds."""
+
+    def __init__(self, project_dir: Path, cache_filepath: Path):
+
+        self._project_dir: Path = project_dir
+        self._cache_filepath: Path = cache_filepath
+        self._patterns: list[str] = DEFAULT_IGNORE_PATTERNS + self._read_ignore_file()
+        self._rules: str = hashlib.sha256(
+            json.dumps(self._patterns).encode("utf-8")
+        ).hexdigest()
+        self._cache: dict[str, CachedDirectory] = self._load()
+        self._visited: set[str] = set()
+        self._roots: set[str] = set()
+        self._changed: bool = False
+
+    def walk(self, root: Path, suffix: str = ".md") -> Iterator[Path]:
+        """Yields the files with the suffix within the root directory, in a stable
+        order."""
+
+        self._roots.add(self._key(root))
+        pending = [root]
+        while pending:
+            dirpath = pending.pop()
+            filenames, dirnames = self._list(dirpath)
+            for filename in filenames:
+                if filename.endswith(suffix):
+                    yield dirpath / filename
+            pending.extend(dirpath / dirname for dirname in reversed(dirnames))
+
+    def save(self):
+        """Writes the cached listings to disk, dropping the ones of directories within
+        the walked roots that no longer exist."""
+
+        stale_keys = [
+            key
+            for key in self._cache
+            if key not in self._visited and self._is_within_roots(key)
+        ]
+        for key in stale_keys:
+            del self._cache[key]
+        if not self._changed and not stale_keys:
+            return
+
+        self._cache_filepath.parent.mkdir(parents=True, exist_ok=True)
+        content = {"rules": self._rules, "directories": self._cache}
+        write_atomic(self._cache_filepath, json.dumps(content).encode("utf-8"))
+        self._changed = False
+
+    # ----- HELPER METHODS -----
+    def _list(self, dirpath: Path) -> tuple[list[str], list[str]]:
+        """Returns the names of the files and of the directories within the directory
+        that aren't ignored, from the cache if the directory wasn't modified."""
+
+        key = self._key(dirpath)
+        try:
+            mtime_ns = os.stat(dirpath).st_mtime_ns
+        except FileNotFoundError:
+            return [], []
+        self._visited.add(key)
+
+        cached = self._cache.get(key)
+        if cached is not None and cached["mtime_ns"] == mtime_ns:
+            return cached["files"], cached["directories"]
+
+        filenames: list[str] = []
+        dirnames: list[str] = []
+        with os.scandir(dirpath) as entries:
+            for entry in entries:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if self._is_ignored(f"{key}/{entry.name}", entry.name, is_dir):
+                    continue
+                (dirnames if is_dir else filenames).append(entry.name)
+        filenames.sort()
+        dirnames.sort()
+
+        if time.time_ns() - mtime_ns > RACY_WINDOW_NS:
+            self._cache[key] = CachedDirectory(
+                mtime_ns=mtime_ns, files=filenames, directories=dirnames
+            )
+            self._changed = True
+        else:
+            self._cache.pop(key, None)
+        return filenames, dirnames
+
+    def _is_ignored(self, path: str, name: str, is_dir: bool) -> bool:
+        """Checks the entry against the ignore patterns. Patterns with a '/' other
+        than a trailing one are matched against the path relative to the project
+        directory and the others against the name."""
+
+        for pattern in self._patterns:
+            if pattern.endswith("/"):
+                if not is_dir:
+                    continue
+                pattern = pattern[:-1]
+            if "/" in pattern:
+                if fnmatchcase(path, pattern.lstrip("/")):
+                    return True
+            elif fnmatchcase(name, pattern):
+                return True
+        return False
+
+    def _is_within_roots(self, key: str) -> bool:
+
+        return any(key == root or key.startswith(root + "/") for root in self._roots)
+
+    def _read_ignore_file(self) -> list[str]:
+        """Returns the patterns in the ignore file of the project. Blank lines and
+        lines starting with '#' are skipped."""
+
+        try:
+            with open(self._project_dir / IGNORE_FILENAME, "r") as f:
+                lines = [line.strip() for line in f]
+        except FileNotFoundError:
+            return []
+
+        return [line for line in lines if line and not line.startswith("#")]
+
+    def _load(self) -> dict[str, CachedDirectory]:
+        """Reads the cached listings from disk. They're discarded if they were made
+        with different ignore patterns or the file is missing or corrupt."""
+
+        try:
+            with open(self._cache_filepath, "r") as f:
+                content = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        if not isinstance(content, dict) or content.get("rules") != self._rules:
+            return {}
+        return content.get("directories", {})
+
+    def _key(self, dirpath: Path) -> str:
+        """Returns the path of the directory relative to the project directory, which
+        is what the listings are cached under."""
+
+        try:
+            return dirpath.relative_to(self._project_dir).as_posix()
+        except ValueError:
+            return dirpath.as_posix()
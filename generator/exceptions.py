@@ -6,6 +6,18 @@ class InvalidMetadataSyntax(Exception):
     pass
 
 
+class ContentNotFound(Exception):
+    pass
+
+
+class NotInContentDirectory(Exception):
+    pass
+
+
+class NotInSubdirectory(Exception):
+    pass
+
+
 class ConfigNotFound(Exception):
     pass
 
@@ -15,3 +27,23 @@ class InvalidConfig(Exception):
 
         super().__init__()
         self.error: str = error
+
+
+class AssetNotFound(Exception):
+    pass
+
+
+class InvalidShard(Exception):
+    pass
+
+
+class NotAShard(Exception):
+    pass
+
+
+class IncompleteShards(Exception):
+    pass
+
+
+class InvalidTarget(Exception):
+    pass
@@ -0,0 +1,288 @@
+# Standard library imports
+import json
+import hashlib
+from pathlib import Path
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Iterable, Optional
+from urllib.parse import quote
+from xml.sax.saxutils import XMLGenerator
+
+# Local imports
+from generator.publish import open_atomic
+from generator.types import IndexEntry
+
+
+# ----- CONSTANTS -----
+
+SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+ATOM_NAMESPACE = "http://www.w3.org/2005/Atom"
+DUBLIN_CORE_NAMESPACE = "http://purl.org/dc/elements/1.1/"
+# Limit of the sitemap protocol for a single sitemap file
+MAX_SITEMAP_URLS = 50_000
+DEFAULT_FEED_SIZE = 20
+
+SITEMAP_INDEX = "sitemap.xml"
+RSS_FEED = "rss.xml"
+ATOM_FEED = "atom.xml"
+
+
+class Feeds:
+    """The sitemap and the RSS and Atom feeds of the site.
+
+    The sitemap is split into chunks of at most MAX_SITEMAP_URLS URLs that are listed
+    by a sitemap index. URLs keep the chunk they were first assigned to and new URLs
+    fill the chunks that have room, so adding or removing a page only changes the
+    chunk holding it rather than shifting every following chunk. The digests of the
+    written files are kept so that only the files whose contents changed are written
+    again. Every file is streamed to disk element by element."""
+
+    def __init__(self, publish_dir: Path, filepath: Path, base_url: str, title: str):
+
+        self._publish_dir: Path = publish_dir
+        self._filepath: Path = filepath
+        # URLs are joined onto the base URL, so it has to end with a '/'
+        self._base_url: str = base_url.rstrip("/") + "/"
+        self._title: str = title
+        state = self._load()
+        self._chunks: dict[str, list[str]] = state.get("chunks", {})
+        self._digests: dict[str, str] = state.get("digests", {})
+
+    def write_sitemap(self, lastmods: dict[str, str]) -> int:
+        """Writes the chunks of the sitemap that changed and the sitemap index. The
+        URLs are given relative to the publish directory along with the dates they
+        were last modified. Returns the number of files written or removed."""
+
+        chunks = self._assign_chunks(lastmods)
+        written = 0
+        index: list[tuple[str, str]] = []
+        for number, paths in sorted(chunks.items(), key=lambda item: int(item[0])):
+            filename = f"sitemap-{number}.xml"
+            urls = sorted((path, lastmods[path]) for path in paths)
+            index.append((filename, max(lastmod for _, lastmod in urls)))
+            if self._write_if_changed(filename, urls, self._stream_urlset):
+                written += 1
+
+        for number in self._chunks.keys() - chunks.keys():
+            filename = f"sitemap-{number}.xml"
+            (self._publish_dir / filename).unlink(missing_ok=True)
+            self._digests.pop(filename, None)
+            written += 1
+        self._chunks = chunks
+
+        if self._write_if_changed(SITEMAP_INDEX, index, self._stream_sitemap_index):
+            written += 1
+        return written
+
+    def write_feeds(self, articles: list[IndexEntry], lastmods: dict[str, str]) -> int:
+        """Writes the RSS and Atom feeds of the given articles, newest first, unless
+        they didn't change. The dates the outputs were last modified stand in for
+        articles without a valid date. Returns the number of files written."""
+
+        entries = [
+            (
+                article.title,
+                article.output,
+                self._get_date(article.date, lastmods.get(article.output)),
+                article.author,
+                article.metadata.get(
+                    "description", article.metadata.get("summary", "")
+                ),
+            )
+            for article in articles
+        ]
+        written = 0
+        if self._write_if_changed(RSS_FEED, entries, self._stream_rss):
+            written += 1
+        if self._write_if_changed(ATOM_FEED, entries, self._stream_atom):
+            written += 1
+        return written
+
+    def save(self):
+        """Writes the chunk assignments and the digests of the written files to
+        disk."""
+
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._filepath, "w+") as f:
+            f.seek(0)
+            json.dump({"chunks": self._chunks, "digests": self._digests}, f)
+
+    # ----- HELPER METHODS -----
+    def _assign_chunks(self, lastmods: dict[str, str]) -> dict[str, list[str]]:
+        """Drops the removed URLs from their chunks and adds the new ones to the
+        chunks with room, opening new chunks once they're full."""
+
+        chunks: dict[str, list[str]] = {}
+        assigned: set[str] = set()
+        for number, paths in self._chunks.items():
+            kept = [path for path in paths if path in lastmods]
+            assigned.update(kept)
+            if kept:
+                chunks[number] = kept
+
+        new_paths = sorted(lastmods.keys() - assigned)
+        numbers = sorted(chunks, key=int)
+        next_number = int(numbers[-1]) + 1 if numbers else 1
+        while new_paths:
+            room = [
+                number for number in numbers if len(chunks[number]) < MAX_SITEMAP_URLS
+            ]
+            if room:
+                number = room[0]
+            else:
+                number = str(next_number)
+                next_number += 1
+                numbers.append(number)
+                chunks[number] = []
+            free = MAX_SITEMAP_URLS - len(chunks[number])
+            chunks[number].extend(new_paths[:free])
+            new_paths = new_paths[free:]
+
+        return chunks
+
+    def _write_if_changed(self, filename: str, items: list, stream) -> bool:
+        """Streams the items to the file with the given writer unless the file
+        already exists and was written from the same items."""
+
+        digest = hashlib.sha256(
+            json.dumps([self._base_url, self._title, items]).encode("utf-8")
+        ).hexdigest()
+        filepath = self._publish_dir / filename
+        if self._digests.get(filename) == digest and filepath.exists():
+            return False
+
+        with open_atomic(filepath) as f:
+            xml = XMLGenerator(f, encoding="utf-8", short_empty_elements=True)
+            xml.startDocument()
+            stream(xml, items)
+            xml.endDocument()
+        self._digests[filename] = digest
+        return True
+
+    def _stream_urlset(self, xml: XMLGenerator, urls: list[tuple[str, str]]):
+
+        xml.startElement("urlset", {"xmlns": SITEMAP_NAMESPACE})
+        for path, lastmod in urls:
+            xml.startElement("url", {})
+            self._add_element(xml, "loc", self._get_url(path))
+            self._add_element(xml, "lastmod", lastmod)
+            xml.endElement("url")
+        xml.endElement("urlset")
+
+    def _stream_sitemap_index(self, xml: XMLGenerator, sitemaps: list[tuple[str, str]]):
+
+        xml.startElement("sitemapindex", {"xmlns": SITEMAP_NAMESPACE})
+        for filename, lastmod in sitemaps:
+            xml.startElement("sitemap", {})
+            self._add_element(xml, "loc", self._get_url(filename))
+            self._add_element(xml, "lastmod", lastmod)
+            xml.endElement("sitemap")
+        xml.endElement("sitemapindex")
+
+    def _stream_rss(self, xml: XMLGenerator, entries: list[tuple]):
+
+        xml.startElement("rss", {"version": "2.0", "xmlns:dc": DUBLIN_CORE_NAMESPACE})
+        xml.startElement("channel", {})
+        self._add_element(xml, "title", self._title)
+        self._add_element(xml, "link", self._base_url)
+        self._add_element(xml, "description", self._title)
+        for title, path, date, author, summary in entries:
+            xml.startElement("item", {})
+            self._add_element(xml, "title", title)
+            self._add_element(xml, "link", self._get_url(path))
+            self._add_element(xml, "guid", self._get_url(path))
+            self._add_element(xml, "pubDate", format_datetime(self._parse_date(date)))
+            # RSS expects an email address in 'author', so the name goes in
+            # 'dc:creator' instead
+            if author:
+                self._add_element(xml, "dc:creator", author)
+            if summary:
+                self._add_element(xml, "description", summary)
+            xml.endElement("item")
+        xml.endElement("channel")
+        xml.endElement("rss")
+
+    def _stream_atom(self, xml: XMLGenerator, entries: list[tuple]):
+
+        # An empty feed was last updated at the epoch rather than at build time, so
+        # that its contents don't change between builds
+        updated = max((date for _, _, date, _, _ in entries), default="1970-01-01")
+        xml.startElement("feed", {"xmlns": ATOM_NAMESPACE})
+        self._add_element(xml, "title", self._title)
+        self._add_element(xml, "id", self._base_url)
+        xml.startElement("link", {"href": self._base_url})
+        xml.endElement("link")
+        xml.startElement("link", {"href": self._get_url(ATOM_FEED), "rel": "self"})
+        xml.endElement("link")
+        self._add_element(xml, "updated", self._format_timestamp(updated))
+        for title, path, date, author, summary in entries:
+            xml.startElement("entry", {})
+            self._add_element(xml, "title", title)
+            self._add_element(xml, "id", self._get_url(path))
+            xml.startElement("link", {"href": self._get_url(path)})
+            xml.endElement("link")
+            self._add_element(xml, "updated", self._format_timestamp(date))
+            if author:
+                xml.startElement("author", {})
+                self._add_element(xml, "name", author)
+                xml.endElement("author")
+            if summary:
+                self._add_element(xml, "summary", summary)
+            xml.endElement("entry")
+        xml.endElement("feed")
+
+    def _add_element(self, xml: XMLGenerator, name: str, text: str):
+
+        xml.startElement(name, {})
+        xml.characters(text)
+        xml.endElement(name)
+
+    def _get_url(self, path: str) -> str:
+
+        return self._base_url + quote(path)
+
+    def _get_date(self, date: str, fallback: Optional[str]) -> str:
+        """Returns the date as YYYY-MM-DD, or the fallback if it isn't a valid ISO
+        date."""
+
+        try:
+            return datetime.fromisoformat(date).date().isoformat()
+        except ValueError:
+            return fallback or "1970-01-01"
+
+    def _parse_date(self, date: str) -> datetime:
+
+        return datetime.fromisoformat(date).replace(tzinfo=timezone.utc)
+
+    def _format_timestamp(self, date: str) -> str:
+
+        return self._parse_date(date).isoformat().replace("+00:00", "Z")
+
+    def _load(self) -> dict:
+        """Reads the chunk assignments and the digests from disk. A missing or
+        corrupt file means every file is written again."""
+
+        try:
+            with open(self._filepath, "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        return state if isinstance(state, dict) else {}
+
+
+def get_lastmods(publish_dir: Path, outputs: Iterable[str]) -> dict[str, str]:
+    """Returns the dates the outputs were last modified, as YYYY-MM-DD. Outputs are
+    only written when their contents change, so the dates are accurate. Outputs that
+    don't exist are left out."""
+
+    lastmods: dict[str, str] = {}
+    for output in outputs:
+        try:
+            mtime = (publish_dir / output).stat().st_mtime
+        except FileNotFoundError:
+            continue
+        lastmods[output] = (
+            datetime.fromtimestamp(mtime, timezone.utc).date().isoformat()
+        )
+    return lastmods
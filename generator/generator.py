@@ -1,27 +1,114 @@
 # Standard library imports
+import os
+import json
 import shutil
+import hashlib
+import posixpath
 from pathlib import Path
-from typing import Callable
+from itertools import repeat
+from functools import cached_property
+from typing import Callable, Optional
+from concurrent.futures import ProcessPoolExecutor
 
 # External library imports
-import markdown
 import typer
+from jinja2 import Environment, TemplateError
 
 from generator import exceptions
 
 # Local imports
+from generator.assets import AssetPipeline
+from generator.checker import LinkChecker
+from generator.converter import MarkdownCache, MarkdownConverter
+from generator.dependencies import TemplateDependencies
+from generator.discovery import ContentDiscovery
+from generator.feeds import DEFAULT_FEED_SIZE, Feeds, get_lastmods
+from generator.index import MetadataIndex
+from generator.listings import DEFAULT_PAGE_SIZE, Listings
+from generator.manifest import Manifest
 from generator.parser import Parser
-from generator.templater import ArticleTemplater, PageTemplater
-from generator.types import FileDetails
+from generator.pipeline import BackgroundWriter, prefetch
+from generator.postprocess import minify_html, precompress
+from generator.profiler import Profiler
+from generator.publish import clone_directory, exchange_directories, write_if_changed
+from generator.search import SearchIndex, extract_terms
+from generator.shards import SHARD_DIRECTORY, check_shards, get_shard, save_shard
+from generator.sync import sync_directory
+from generator.templater import (
+    ArticleTemplater,
+    ListingTemplater,
+    PageTemplater,
+    THEME_TEMPLATES_DIR,
+    Templater,
+    create_environment,
+)
+from generator.types import (
+    BrokenReference,
+    CompressStats,
+    FailedFile,
+    FileDetails,
+    ManifestEntry,
+    ParsedFileData,
+    SearchDocument,
+    WorkerResult,
+)
 from helpers import get_config
 
 
+# ----- CONSTANTS -----
+
+# Files of the state directory that describe what was written to the publish
+# directory, which a staged build works on copies of
+STATE_FILES = (
+    "manifest.json",
+    "index.sqlite",
+    "search.sqlite",
+    "listings.json",
+    "feeds.json",
+)
+
+
 class Generator:
     """A class to generate the HTML content as well as the metadata."""
 
-    def __init__(self, theme: str = "default"):
+    ARTICLE_TEMPLATE: str = "article_template.html"
+
+    def __init__(
+        self,
+        theme: Optional[str] = None,
+        *,
+        full: bool = False,
+        jobs: int = 1,
+        pipeline: bool = False,
+        profile: bool = False,
+        minify: bool = False,
+        staging: bool = False,
+        publish_dir: Optional[Path] = None,
+        shard: Optional[tuple[int, int]] = None,
+        targets: Optional[list[tuple[str, Path]]] = None,
+        primary: Optional["Generator"] = None,
+        state_dir: Optional[Path] = None,
+    ):
 
-        self.theme: str = theme
+        # The theme set up in the project configuration is used unless one is given
+        self.theme: str = theme or self._get_default_theme()
+        self.skipped_files: int = 0
+        self.generated_listings: int = 0
+        self.generated_feeds: int = 0
+        # The HTML files written during the build, relative to the publish directory
+        self.rendered_outputs: set[str] = set()
+        self.profiler: Profiler = Profiler(enabled=profile)
+        self._full: bool = full
+        self._jobs: int = jobs
+        self._pipeline: bool = pipeline
+        self._minify: bool = minify
+        # The index of the shard to build and the number of shards
+        self._shard: Optional[tuple[int, int]] = shard
+        self._writer: Optional[BackgroundWriter] = None
+        self._theme_synced: bool = False
+        self._search_enabled: bool = self._is_search_enabled()
+        # The articles rendered since the search index was last updated
+        self._search_documents: list[SearchDocument] = []
 
         self._project_dir: Path
         self._content_dir: Path
@@ -31,35 +118,133 @@ class Generator:
             self._content_dir,
             self._publish_dir,
         ) = self._get_directories()
+        if publish_dir is not None:
+            publish_dir.mkdir(parents=True, exist_ok=True)
+            self._publish_dir = publish_dir
+        if shard is not None:
+            save_shard(self._publish_dir, shard)
+        # The state directory of the generator that started this worker process
+        self._state_dir: Optional[Path] = state_dir
+        # The publish directory that's swapped with the staged build once it's done
+        self._live_dir: Optional[Path] = None
+        if staging:
+            self._live_dir = self._publish_dir
+            self._publish_dir = self._stage()
 
         self._parser: Parser = Parser()
-        self._article_templater: ArticleTemplater = ArticleTemplater()
-        self._page_templater: PageTemplater = PageTemplater()
+        self._markdown_cache: MarkdownCache = MarkdownCache(
+            self._project_dir / ".gen" / "markdown"
+        )
+        self._converter: MarkdownConverter = MarkdownConverter(self._markdown_cache)
+        _, theme_dir = self._get_theme_directory()
+        self._jinja_env: Environment = create_environment(theme_dir)
+        self._article_templater: ArticleTemplater = ArticleTemplater(self._jinja_env)
+        self._page_templater: PageTemplater = PageTemplater(self._jinja_env)
+        self._listing_templater: ListingTemplater = ListingTemplater(self._jinja_env)
+        Templater.enable_bytecode_cache(
+            self._project_dir / ".gen" / "jinja", self._jinja_env
+        )
+        self._assets: AssetPipeline = AssetPipeline(
+            theme_dir, self._publish_dir / "assets"
+        )
+        Templater.enable_assets(self._assets, self._jinja_env)
+        self._template_dependencies: TemplateDependencies = TemplateDependencies(
+            self._jinja_env
+        )
+
+        # The generator whose sources this one renders as an additional target. The
+        # sources are only parsed and converted by the primary generator.
+        self._primary: Optional[Generator] = primary
+        self._manifest: Manifest = Manifest(
+            self._get_state_directory() / "manifest.json", self._project_dir
+        )
+        self._targets: list[Generator] = [
+            Generator(
+                target_theme,
+                full=full,
+                profile=profile,
+                minify=minify,
+                publish_dir=target_dir,
+                primary=self,
+            )
+            for target_theme, target_dir in targets or []
+        ]
+        for target in self._targets:
+            target.profiler = self.profiler
 
-    def generate_single_article(self, filepath: Path):
-        """Generates the HTML file for an article and saves it."""
+    @cached_property
+    def index(self) -> MetadataIndex:
+        """The index of the metadata of the articles. It's opened on first use so that
+        worker processes never touch it. Additional targets share the index of their
+        primary generator."""
 
-        parsed_contents = self._parser.parse(filepath)
-        parsed_contents["content"] = markdown.markdown(parsed_contents["content"])
-        rendered_html = self._article_templater.render(parsed_contents)
-        self._save_rendered_html(filepath, rendered_html)
+        if self._primary is not None:
+            return self._primary.index
+        return MetadataIndex(
+            self._get_state_directory() / "index.sqlite", self._project_dir
+        )
 
-    def generate_single_page(self, filepath: Path):
-        """Generates the HTML file for a page (home page, about me etc.) and saves it."""
+    @cached_property
+    def listings(self) -> Listings:
+        """The listings of the articles along with the state of their pages in the
+        publish directory."""
 
-        parsed_contents = self._parser.parse(filepath)
-        parsed_contents["content"] = markdown.markdown(parsed_contents["content"])
-        template_name = self._get_page_template_name(filepath)
-        rendered_html = self._page_templater.render(
-            parsed_contents, template=template_name
+        return Listings(
+            self.index,
+            self._get_state_directory() / "listings.json",
+            self._get_page_size(),
+        )
+
+    @cached_property
+    def discovery(self) -> ContentDiscovery:
+        """Finds the markdown files. It's only set up when needed since worker
+        processes never look for files."""
+
+        return ContentDiscovery(
+            self._project_dir, self._project_dir / ".gen" / "discovery.json"
         )
-        self._save_rendered_html(filepath, rendered_html)
+
+    @cached_property
+    def search(self) -> SearchIndex:
+        """The search index of the articles. It's opened on first use so that worker
+        processes never touch it."""
+
+        return SearchIndex(
+            self._get_state_directory() / "search.sqlite", self._publish_dir / "search"
+        )
+
+    @property
+    def total_skipped_files(self) -> int:
+        """The number of files left as they were, summed over every target."""
+
+        return sum(target.skipped_files for target in self._get_targets())
+
+    def generate_single_article(self, filepath: Path, source: Optional[str] = None):
+        """Generates the HTML file for an article and saves it, for every target.
+        Targets whose output was already built from the same inputs are skipped. The
+        contents of the file can be passed in if they were already read."""
+
+        parsed_contents = self._parse(filepath, source)
+        self._render(
+            filepath, parsed_contents, Generator.ARTICLE_TEMPLATE, is_article=True
+        )
+
+    def generate_single_page(self, filepath: Path, source: Optional[str] = None):
+        """Generates the HTML file for a page (home page, about me etc.) and saves it,
+        for every target. Targets whose output was already built from the same inputs
+        are skipped. The contents of the file can be passed in if they were already
+        read."""
+
+        parsed_contents = self._parse(filepath, source)
+        template_name = self._get_page_template_name(filepath)
+        self._render(filepath, parsed_contents, template_name, is_article=False)
 
     def generate_all_pages(self) -> int:
         """Generates and saves all the HTML files in the pages directory. Returns the number
         of HTML files generated."""
 
-        self._set_theme()
+        for target in self._get_targets():
+            target._set_theme()
 
         return self._generate_all(
             self._content_dir / "pages", generator_method=self.generate_single_page
@@ -69,15 +254,294 @@ class Generator:
         """Generates and saves all the HTML files for all markdown files in the articles
         directory. Returns the number of HTML files generated."""
 
-        # TODO: Only set theme if the theme has changed.
-        self._set_theme()
+        for target in self._get_targets():
+            target._set_theme()
 
         return self._generate_all(
             self._content_dir / "articles",
             generator_method=self.generate_single_article,
         )
 
+    def generate_path(self, path: Path, *, subdirectory: str = "") -> int:
+        """Generates the HTML file for a single markdown file, or the HTML files for
+        every markdown file in a directory, within the content directory. The path may
+        also be given relative to the content directory or to the given subdirectory
+        of it, and has to be within that subdirectory if one is given. The content
+        directory itself builds both the articles and the pages. The theme isn't
+        synced. Returns the number of HTML files generated. Raises NotInSubdirectory
+        if the path isn't within the given subdirectory."""
+
+        path = self._resolve_content_path(path, subdirectory)
+        if subdirectory:
+            subdirectory_dir = self._content_dir / subdirectory
+            if path != subdirectory_dir and subdirectory_dir not in path.parents:
+                raise exceptions.NotInSubdirectory(subdirectory)
+
+        pages_dir = self._content_dir / "pages"
+        if path == self._content_dir:
+            processed_files = self._generate_all(
+                self._content_dir / "articles",
+                generator_method=self.generate_single_article,
+            )
+            return processed_files + self._generate_all(
+                pages_dir, generator_method=self.generate_single_page
+            )
+        if path == pages_dir or pages_dir in path.parents:
+            generator_method = self.generate_single_page
+        else:
+            generator_method = self.generate_single_article
+
+        if path.is_dir():
+            return self._generate_all(path, generator_method=generator_method)
+
+        md_files = self._select_shard([path])
+        processed_files = self._generate_files(md_files, generator_method)
+        for target in self._get_targets():
+            target._manifest.save()
+        if generator_method == self.generate_single_article:
+            changed = self._sync_index(md_files, path)
+            for target in self._get_targets():
+                self.generated_listings += target._generate_listings(changed)
+            self._update_search(md_files, path)
+        return processed_files
+
+    def generate_feeds(self) -> int:
+        """Writes the sitemap of every generated file and the RSS and Atom feeds of
+        the newest articles for every target, if the project configuration sets the
+        URL of the site. The pages are taken from the build manifest and the listings,
+        and the articles from the metadata index, so no output is read. Only the files
+        whose contents changed are written. Nothing is written for shards. Returns the
+        number of files written or removed."""
+
+        config = get_config()
+        if self._shard is not None or "base_url" not in config:
+            return 0
+
+        written = 0
+        with self.profiler.measure("feeds"):
+            for target in self._get_targets():
+                written += target._write_feeds(
+                    config["base_url"], config.get("project_name", "")
+                )
+
+        self.generated_feeds += written
+        return written
+
+    def precompress(self) -> CompressStats:
+        """Saves gzipped copies of the HTML, CSS and JS files in the publish directory
+        of every target next to them. Copies that are already up to date are
+        skipped."""
+
+        with self.profiler.measure("compress"):
+            stats = [precompress(target._publish_dir) for target in self._get_targets()]
+        return CompressStats(*(sum(counts) for counts in zip(*stats)))
+
+    def merge(self, shard_dirs: list[Path]) -> int:
+        """Combines the outputs of the shards of a build into the publish directory
+        along with their partial manifests and metadata indexes, removes the outputs
+        of sources that no longer exist and generates the listing pages, the search
+        index, the sitemap and the feeds of the whole site. Returns the number of
+        merged sources. Raises NotAShard if a directory isn't the output of a shard
+        and IncompleteShards unless the directories hold every shard of a build."""
+
+        check_shards(shard_dirs)
+        manifests: list[Manifest] = []
+        for shard_dir in shard_dirs:
+            manifest_fp = shard_dir / SHARD_DIRECTORY / "manifest.json"
+            if not manifest_fp.exists():
+                raise exceptions.NotAShard(str(shard_dir))
+            manifests.append(Manifest(manifest_fp, self._project_dir))
+
+        with self.profiler.measure("merge"):
+            previous_outputs = self._manifest.outputs()
+            for source in self._manifest.sources():
+                self._manifest.remove(source)
+            for shard_dir, manifest in zip(shard_dirs, manifests):
+                self._manifest.merge(manifest)
+                sync_directory(
+                    shard_dir, self._publish_dir, prune=False, exclude=[SHARD_DIRECTORY]
+                )
+            for output in previous_outputs - self._manifest.outputs():
+                (self._publish_dir / output).unlink(missing_ok=True)
+            self._manifest.save()
+
+        with self.profiler.measure("index"):
+            self.index.merge(
+                [
+                    shard_dir / SHARD_DIRECTORY / "index.sqlite"
+                    for shard_dir in shard_dirs
+                    if (shard_dir / SHARD_DIRECTORY / "index.sqlite").exists()
+                ]
+            )
+        # The changes of the merged index aren't known, so every listing is checked
+        self.generated_listings += self._generate_listings(None)
+
+        if self._search_enabled:
+            with self.profiler.measure("search"):
+                self.search.merge(
+                    [
+                        shard_dir / SHARD_DIRECTORY / "search.sqlite"
+                        for shard_dir in shard_dirs
+                        if (shard_dir / SHARD_DIRECTORY / "search.sqlite").exists()
+                    ]
+                )
+                self.search.write()
+        self.generate_feeds()
+
+        return len(self._manifest.sources())
+
+    def prune_assets(self) -> int:
+        """Removes the assets of every target that none of the templates link to
+        anymore, e.g. earlier versions of edited stylesheets. Outputs that weren't
+        built again may still link to them, so this is only meant for builds of the
+        whole site. Nothing is removed for shards, or for a target whose templates
+        pass files to `asset()` that are only known at render time. Returns the
+        number of removed assets."""
+
+        if self._shard is not None:
+            return 0
+
+        removed = 0
+        with self.profiler.measure("assets"):
+            for target in self._get_targets():
+                calls = target._get_asset_calls()
+                if calls is not None:
+                    removed += target._assets.prune(calls)
+        return removed
+
+    def check_links(self, changed_only: bool = False) -> list[BrokenReference]:
+        """Checks the internal links and asset references of the HTML files in the
+        publish directory of every target, or only of the files rendered during the
+        build. Pages that link to an output removed during the build aren't rendered
+        again, so only a full check finds those links. The sources of the broken
+        references are given relative to the current directory."""
+
+        broken: list[BrokenReference] = []
+        with self.profiler.measure("check"):
+            for target in self._get_targets():
+                checker = LinkChecker(target._publish_dir)
+                outputs = target.rendered_outputs if changed_only else None
+                broken.extend(
+                    reference._replace(
+                        source=os.path.relpath(target._publish_dir / reference.source)
+                    )
+                    for reference in checker.check(outputs, jobs=self._jobs)
+                )
+        return broken
+
+    def publish(self):
+        """Swaps the staged build in as the publish directory in a single step and
+        removes the previous build. The state saved by the staged build then replaces
+        the one of the previous build. Does nothing unless the build is staged."""
+
+        if self._live_dir is None:
+            return
+
+        with self.profiler.measure("publish"):
+            # The indexes are closed so that their files can be moved
+            for name in ("index", "search"):
+                if name in self.__dict__:
+                    self.__dict__.pop(name).close()
+            staging_dir = self._get_staging_directory()
+            state_dir = self._get_publish_state_directory(self._live_dir)
+            state_dir.mkdir(parents=True, exist_ok=True)
+            exchange_directories(self._live_dir, self._publish_dir)
+            for filepath in (staging_dir / "state").iterdir():
+                os.replace(filepath, state_dir / filepath.name)
+            shutil.rmtree(staging_dir)
+        self._publish_dir, self._live_dir = self._live_dir, None
+        self._manifest = Manifest(
+            self._get_state_directory() / "manifest.json", self._project_dir
+        )
+
     # ----- HELPER METHODS -----
+    def _stage(self) -> Path:
+        """Clones the publish directory with hard links so that the build can happen
+        out of sight of the server and returns the path of the clone. The build works
+        on copies of the state files kept next to the clone, so a staged build that's
+        never published leaves the state of the publish directory untouched."""
+
+        staging_dir = self._get_staging_directory()
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+        state_dir = staging_dir / "state"
+        state_dir.mkdir(parents=True)
+        for name in STATE_FILES:
+            filepath = self._get_publish_state_directory(self._live_dir) / name
+            if filepath.exists():
+                # Copied rather than linked since SQLite writes in place
+                shutil.copy2(filepath, state_dir / name)
+
+        clone_directory(self._live_dir, staging_dir / "publish")
+        return staging_dir / "publish"
+
+    def _get_state_directory(self) -> Path:
+        """Returns the directory the build manifest and the metadata and search
+        indexes are kept in. Shards keep partial ones along with their output so that
+        they can be merged. Staged builds keep theirs next to the staged output until
+        it's published. Worker processes use the one of the generator that started
+        them."""
+
+        if self._state_dir is not None:
+            return self._state_dir
+        if self._live_dir is not None:
+            return self._get_staging_directory() / "state"
+        if self._shard is not None:
+            return self._publish_dir / SHARD_DIRECTORY
+        return self._get_publish_state_directory(self._publish_dir)
+
+    def _get_publish_state_directory(self, publish_dir: Path) -> Path:
+        """Returns the directory the state of the builds into the publish directory is
+        kept in. Builds into any other directory than the one of the project, e.g.
+        additional targets, keep theirs in a directory named after the hash of their
+        publish directory."""
+
+        if publish_dir.resolve() == (self._project_dir / "publish").resolve():
+            return self._project_dir / ".gen"
+        name = self._hash(str(publish_dir.resolve()))[:12]
+        return self._project_dir / ".gen" / "targets" / name
+
+    def _get_targets(self) -> list["Generator"]:
+        """Returns the generators of every target, this one first."""
+
+        return [self, *self._targets]
+
+    def _select_shard(self, md_files: list[Path]) -> list[Path]:
+        """Returns the markdown files that belong to the shard being built, or all of
+        them if the build isn't sharded."""
+
+        if self._shard is None:
+            return md_files
+        index, count = self._shard
+        return [
+            md_file
+            for md_file in md_files
+            if get_shard(self._manifest.key(md_file), count) == index
+        ]
+
+    def _get_staging_directory(self) -> Path:
+        """Returns the directory holding the output and the state of a staged build."""
+
+        return self._project_dir / ".gen" / "staging"
+
+    def _resolve_content_path(self, path: Path, subdirectory: str) -> Path:
+        """Finds the file or directory the path refers to and returns its path within
+        the content directory."""
+
+        candidates = [path, self._content_dir / subdirectory / path]
+        for candidate in candidates:
+            if not candidate.exists():
+                continue
+            resolved = candidate.resolve()
+            content_dir = self._content_dir.resolve()
+            if resolved != content_dir and content_dir not in resolved.parents:
+                raise exceptions.NotInContentDirectory(str(path))
+            # Keeping the paths in terms of the configured project directory so that
+            # they match the keys in the manifest
+            return self._content_dir / resolved.relative_to(content_dir)
+
+        raise exceptions.ContentNotFound(str(path))
+
     def _generate_all(
         self, dirpath: Path, *, generator_method: Callable[[Path], None]
     ) -> int:
@@ -86,20 +550,49 @@ class Generator:
         the number of processed files."""
 
         # Getting the markdown files
-        md_files = [path for path in dirpath.rglob("*.md")]
+        with self.profiler.measure("discovery"):
+            md_files = self._select_shard(list(self.discovery.walk(dirpath)))
+            self.discovery.save()
+
+        processed_files = self._generate_files(md_files, generator_method)
+        for target in self._get_targets():
+            target._remove_stale_outputs(dirpath, md_files)
+            target._manifest.save()
+        if generator_method == self.generate_single_article:
+            changed = self._sync_index(md_files, dirpath)
+            for target in self._get_targets():
+                self.generated_listings += target._generate_listings(changed)
+            self._update_search(md_files, dirpath)
+        self._markdown_cache.evict()
+
+        return processed_files
+
+    def _generate_files(
+        self, md_files: list[Path], generator_method: Callable[[Path], None]
+    ) -> int:
+        """Generates HTML files for the given markdown files and reports the files that
+        couldn't be processed. Returns the number of processed files."""
 
         missing_metadata: list[FileDetails] = []
         invalid_metadata: list[FileDetails] = []
 
         # Generating the HTML file
-        for md_file in md_files:
-            try:
-                generator_method(md_file)  # type: ignore
-            except exceptions.NoMetadata:
-                file_details = FileDetails(md_file.name, md_file)
+        if self._jobs > 1 and len(md_files) > 1:
+            failed_files = self._generate_in_parallel(md_files, generator_method)
+        elif self._pipeline and len(md_files) > 1:
+            failed_files = self._generate_pipelined(md_files, generator_method)
+        else:
+            failed_files = self._generate_serially(md_files, generator_method)
+
+        for md_file, error in failed_files:
+            # An earlier build of the file doesn't describe it anymore, and it has to
+            # be tried again next time
+            for target in self._get_targets():
+                target._manifest.remove(target._manifest.key(md_file))
+            file_details = FileDetails(md_file.name, md_file)
+            if error is exceptions.NoMetadata:
                 missing_metadata.append(file_details)
-            except exceptions.InvalidMetadataSyntax:
-                file_details = FileDetails(md_file.name, md_file)
+            else:
                 invalid_metadata.append(file_details)
 
         processed_files = len(md_files) - len(missing_metadata) - len(invalid_metadata)
@@ -108,6 +601,398 @@ class Generator:
 
         return processed_files
 
+    def _sync_index(self, md_files: list[Path], root: Path) -> set[str]:
+        """Updates the metadata index with the articles within the root. Returns the
+        keys of the articles whose entries changed."""
+
+        with self.profiler.measure("index"):
+            changed = self.index.sync(
+                md_files, root, lambda path: self._get_output_path(path).name
+            )
+            # Only articles belong in the index, but pages used to be indexed when
+            # the whole content directory was built as articles
+            changed |= self.index.retain(self._content_dir / "articles")
+            # Kept until the listings are generated, in case the build stops before
+            if changed and self._shard is None:
+                for target in self._get_targets():
+                    target.listings.defer(changed)
+                    target.listings.save()
+            return changed
+
+    def _generate_listings(self, changed: Optional[set[str]]) -> int:
+        """Generates the listing pages of the articles from the metadata index. Nothing
+        is done unless articles changed (given as the keys of their index entries,
+        or None if it isn't known which did) or the templates, the assets or the page
+        size did. Only the listings the changes affect are looked at, only the pages
+        whose articles, links or templates changed since the last build are rendered,
+        and pages that aren't part of a listing anymore are removed. Nothing is
+        generated for shards or if the project has no listing template. Returns the
+        number of generated pages."""
+
+        # Listings span the whole site, so they're generated when shards are merged
+        if self._shard is not None:
+            return 0
+        if ListingTemplater.TEMPLATE not in Templater.get_templates_list(
+            self._jinja_env
+        ):
+            return 0
+
+        templates = json.dumps(
+            self._template_dependencies.fingerprint(ListingTemplater.TEMPLATE)
+        ) + self._get_assets_digest(ListingTemplater.TEMPLATE)
+        templates += str(self._minify)
+        context = self._hash(templates + str(self._get_page_size()))
+        listings = self.listings
+        listings.defer(changed or set())
+        everything = self._full or changed is None
+        if not everything and listings.is_current(context):
+            return 0
+
+        generated = 0
+
+        with self.profiler.measure("listings"):
+            pages = listings.pages()
+            directories = None if everything else listings.affected(pages, context)
+            for page in pages:
+                if (
+                    directories is not None
+                    and posixpath.dirname(page.output) not in directories
+                ):
+                    continue
+                digest = self._hash(json.dumps(page, sort_keys=True) + templates)
+                if (
+                    not self._full
+                    and listings.digest(page.output) == digest
+                    and self._has_output(page.output)
+                ):
+                    continue
+
+                rendered_html = self._listing_templater.render(page)
+                if self._minify:
+                    rendered_html = minify_html(rendered_html)
+                self._save_listing_html(page.output, rendered_html)
+                listings.record(page.output, digest)
+                self.rendered_outputs.add(page.output)
+                generated += 1
+
+            for output in listings.remove_stale({page.output for page in pages}):
+                self._remove_output(output)
+            listings.update(pages, context)
+            listings.save()
+
+        return generated
+
+    def _write_feeds(self, base_url: str, title: str) -> int:
+        """Writes the sitemap and the feeds into the publish directory. Returns the
+        number of files written or removed."""
+
+        feeds = Feeds(
+            self._publish_dir,
+            self._get_state_directory() / "feeds.json",
+            base_url,
+            title,
+        )
+        outputs = self._manifest.outputs() | set(self.listings.outputs())
+        lastmods = get_lastmods(self._publish_dir, outputs)
+        written = feeds.write_sitemap(lastmods)
+        written += feeds.write_feeds(
+            self.index.articles(limit=self._get_feed_size()), lastmods
+        )
+        feeds.save()
+        return written
+
+    def _update_search(self, md_files: list[Path], root: Path):
+        """Replaces the postings of the articles rendered during the build in the
+        search index of every target, drops the articles within the root that no
+        longer exist and writes the shards of the index that changed. Built articles
+        that were never indexed, e.g. because search was only just enabled, are
+        indexed as well. Shards only keep their partial index, which is written when
+        they're merged."""
+
+        if not self._search_enabled:
+            return
+
+        with self.profiler.measure("search"):
+            # The entries only depend on the sources, so every target shares them
+            documents, self._search_documents = self._search_documents, []
+            for target in self._get_targets():
+                target.search.update(documents)
+
+                # Files that failed to build have no manifest entry and are left out
+                built_files = [
+                    md_file for md_file in md_files if target._manifest.get(md_file)
+                ]
+                indexed = target.search.sources()
+                unindexed = (
+                    self._index_article(md_file)
+                    for md_file in built_files
+                    if self._manifest.key(md_file) not in indexed
+                )
+                target.search.update(
+                    document for document in unindexed if document is not None
+                )
+                target.search.prune(
+                    self._manifest.key(root),
+                    {self._manifest.key(md_file) for md_file in built_files},
+                )
+
+                if self._shard is None:
+                    target.search.write(full=self._full)
+
+    def _index_article(self, filepath: Path) -> Optional[SearchDocument]:
+        """Creates the entry of an article that was built without being indexed.
+        Returns None, after reporting it, if the metadata of the article can't be read
+        anymore."""
+
+        try:
+            parsed_contents = self._parser.parse(filepath)
+        except exceptions.NoMetadata:
+            typer.secho(f"\nMissing metadata in {filepath}", fg="magenta")
+            return None
+        except exceptions.InvalidMetadataSyntax:
+            typer.secho(f"\nInvalid metadata syntax in {filepath}", fg="magenta")
+            return None
+        parsed_contents["content"] = self._converter.convert(parsed_contents["content"])
+        return self._create_search_document(filepath, parsed_contents)
+
+    def _create_search_document(
+        self, filepath: Path, parsed_contents: ParsedFileData
+    ) -> SearchDocument:
+        """Creates the entry of the article in the search index from its metadata and
+        its converted content."""
+
+        metadata = parsed_contents["metadata"]
+        return SearchDocument(
+            source=self._manifest.key(filepath),
+            url=self._get_output_path(filepath).name,
+            title=metadata.get("title", filepath.stem),
+            terms=extract_terms(metadata, parsed_contents["content"]),
+        )
+
+    def _parse(self, filepath: Path, source: Optional[str]) -> ParsedFileData:
+        """Parses the file, or its contents if they were already read."""
+
+        with self.profiler.measure("parse", filepath):
+            if source is None:
+                return self._parser.parse(filepath)
+            return self._parser.parse_source(source)
+
+    def _generate_serially(
+        self, md_files: list[Path], generator_method: Callable[[Path], None]
+    ) -> list[FailedFile]:
+        """Generates the HTML files one after the other in this process. Returns the
+        files that couldn't be processed along with the reason."""
+
+        failed_files: list[FailedFile] = []
+        for md_file in md_files:
+            try:
+                generator_method(md_file)  # type: ignore
+            except (exceptions.NoMetadata, exceptions.InvalidMetadataSyntax) as e:
+                failed_files.append(FailedFile(md_file, type(e)))
+
+        return failed_files
+
+    def _generate_pipelined(
+        self, md_files: list[Path], generator_method: Callable[..., None]
+    ) -> list[FailedFile]:
+        """Generates the HTML files in this process while the markdown files are read
+        ahead and the HTML files are written on I/O threads, so that the disk and the
+        CPU are busy at the same time. Returns the files that couldn't be processed
+        along with the reason."""
+
+        failed_files: list[FailedFile] = []
+        targets = self._get_targets()
+        for target in targets:
+            target._writer = BackgroundWriter(
+                target._write_rendered_html, self.profiler
+            )
+        try:
+            for md_file, source in prefetch(md_files, self.profiler):
+                try:
+                    generator_method(md_file, source)
+                except (exceptions.NoMetadata, exceptions.InvalidMetadataSyntax) as e:
+                    failed_files.append(FailedFile(md_file, type(e)))
+        finally:
+            for target in targets:
+                writer, target._writer = target._writer, None
+                if writer is not None:
+                    writer.close()
+
+        return failed_files
+
+    def _generate_in_parallel(
+        self, md_files: list[Path], generator_method: Callable[[Path], None]
+    ) -> list[FailedFile]:
+        """Generates the HTML files across a pool of worker processes. Each worker sets
+        up its own generator once and sends back the manifest entries of the files it
+        built so that the manifest is only ever written by this process. Returns the
+        files that couldn't be processed along with the reason."""
+
+        jobs = min(self._jobs, len(md_files))
+        # Large chunks keep the inter-process overhead low while still leaving a few
+        # chunks per worker to balance files of different sizes.
+        chunksize = max(1, len(md_files) // (jobs * 4))
+        method_name = generator_method.__name__
+
+        failed_files: list[FailedFile] = []
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(
+                self.theme,
+                self._full,
+                self.profiler.enabled,
+                self._minify,
+                self._publish_dir,
+                self._shard,
+                [(target.theme, target._publish_dir) for target in self._targets],
+                self._get_state_directory(),
+            ),
+        ) as executor:
+            results = executor.map(
+                _generate_in_worker,
+                repeat(method_name),
+                md_files,
+                chunksize=chunksize,
+            )
+            for md_file, result in zip(md_files, results):
+                self.profiler.add_events(result.events)
+                if result.error:
+                    failed_files.append(FailedFile(md_file, result.error))
+                elif result.skipped:
+                    self.skipped_files += 1
+                elif result.entry:
+                    self._manifest.update(md_file, result.entry)
+                    self.rendered_outputs.add(result.entry["output"])
+                for target, entry in zip(self._targets, result.target_entries):
+                    if entry:
+                        target._manifest.update(md_file, entry)
+                        target.rendered_outputs.add(entry["output"])
+                    else:
+                        target.skipped_files += 1
+                if result.search_document:
+                    self._search_documents.append(result.search_document)
+
+        return failed_files
+
+    def _render(
+        self,
+        filepath: Path,
+        parsed_contents: ParsedFileData,
+        template_name: str,
+        *,
+        is_article: bool,
+    ):
+        """Renders the parsed file with the template of every target whose output
+        isn't up to date and saves it. The markdown is converted once, when the first
+        of those targets needs it, and the result is shared by the others."""
+
+        converted: Optional[ParsedFileData] = None
+        for target in self._get_targets():
+            entry = target._create_manifest_entry(
+                filepath, parsed_contents, template_name
+            )
+            if target._is_up_to_date(filepath, entry):
+                target.skipped_files += 1
+                continue
+
+            if converted is None:
+                with self.profiler.measure("markdown", filepath):
+                    converted = ParsedFileData(
+                        content=self._converter.convert(parsed_contents["content"]),
+                        metadata=parsed_contents["metadata"],
+                    )
+            if is_article and target is self and self._search_enabled:
+                with self.profiler.measure("search", filepath):
+                    self._search_documents.append(
+                        self._create_search_document(filepath, converted)
+                    )
+            with self.profiler.measure("render", filepath):
+                if is_article:
+                    rendered_html = target._article_templater.render(converted)
+                else:
+                    rendered_html = target._page_templater.render(
+                        converted, template=template_name
+                    )
+            target._save_rendered_html(filepath, rendered_html)
+            target._manifest.update(filepath, entry)
+            target.rendered_outputs.add(entry["output"])
+
+    def _create_manifest_entry(
+        self, filepath: Path, parsed_contents: ParsedFileData, template_name: str
+    ) -> ManifestEntry:
+        """Creates the manifest entry describing the inputs of the source file."""
+
+        metadata = json.dumps(parsed_contents["metadata"], sort_keys=True)
+        return ManifestEntry(
+            content_hash=self._hash(parsed_contents["content"]),
+            metadata_hash=self._hash(metadata),
+            template=template_name,
+            templates=self._template_dependencies.fingerprint(template_name),
+            assets=self._get_assets_digest(template_name),
+            minified=self._minify,
+            output=self._get_output_path(filepath).name,
+        )
+
+    def _get_assets_digest(self, template_name: str) -> str:
+        """Returns the digest of the theme files the template links to as assets,
+        since the fingerprinted names of the assets change along with them."""
+
+        if not self._template_dependencies.uses(template_name, "asset"):
+            return ""
+        return self._assets.digest(
+            self._template_dependencies.asset_calls(template_name)
+        )
+
+    def _get_asset_calls(self) -> Optional[set[tuple[str, ...]]]:
+        """Returns the files passed to the `asset()` calls of every template, or None
+        if some of them can't be known before rendering."""
+
+        calls: set[tuple[str, ...]] = set()
+        for template in Templater.get_templates_list(self._jinja_env):
+            # The project's templates directory also holds the static files of the
+            # themes
+            if not template.endswith(".html"):
+                continue
+            try:
+                template_calls = self._template_dependencies.asset_calls(template)
+            except (TemplateError, UnicodeDecodeError):
+                return None
+            if template_calls is None:
+                return None
+            calls |= template_calls
+        return calls
+
+    def _is_up_to_date(self, filepath: Path, entry: ManifestEntry) -> bool:
+        """Checks whether the source file was already built from the same inputs and
+        its output still exists. Always false for full rebuilds."""
+
+        if self._full or self._manifest.get(filepath) != entry:
+            return False
+        return self._has_output(entry["output"])
+
+    def _remove_stale_outputs(self, dirpath: Path, md_files: list[Path]):
+        """Removes the outputs of the sources within the directory that were deleted
+        since the last build."""
+
+        existing_sources = {self._manifest.key(path) for path in md_files}
+        stale_outputs: set[str] = set()
+        for source in self._manifest.sources_under(dirpath):
+            if source in existing_sources:
+                continue
+            entry = self._manifest.remove(source)
+            if entry:
+                stale_outputs.add(entry["output"])
+
+        # Another source may have been built to the same output
+        for output in stale_outputs - self._manifest.outputs():
+            (self._publish_dir / output).unlink(missing_ok=True)
+
+    def _hash(self, content: str) -> str:
+        """Returns the hex digest used to detect changes in the content."""
+
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
     def _print_errors(
         self,
         missing_metadata: list[FileDetails],
@@ -128,12 +1013,47 @@ class Generator:
                 typer.secho(details)
 
     def _save_rendered_html(self, filepath: Path, content: str) -> None:
-        """Saves the rendered HTML file in the publish directory."""
+        """Saves the rendered HTML file in the publish directory. During pipelined
+        builds the file is queued to be written in the background. The HTML is
+        minified first if enabled."""
+
+        if self._minify:
+            with self.profiler.measure("minify", filepath):
+                content = minify_html(content)
+        if self._writer is not None:
+            self._writer.write(filepath, content)
+            return
+        with self.profiler.measure("write", filepath):
+            self._write_rendered_html(filepath, content)
+
+    def _write_rendered_html(self, filepath: Path, content: str) -> None:
+        """Writes the rendered HTML file to the publish directory. Files that already
+        hold the same HTML are left untouched, so that their modification times only
+        change along with their contents, and other files are replaced atomically."""
 
-        fp = self._publish_dir / (filepath.stem + ".html")
-        with open(fp, "w+") as f:
-            f.seek(0)
-            f.write(content)
+        write_if_changed(self._get_output_path(filepath), content.encode("utf-8"))
+
+    def _save_listing_html(self, output: str, content: str):
+        """Saves a rendered listing page, given relative to the publish directory."""
+
+        output_fp = self._publish_dir / output
+        output_fp.parent.mkdir(parents=True, exist_ok=True)
+        write_if_changed(output_fp, content.encode("utf-8"))
+
+    def _has_output(self, output: str) -> bool:
+        """Checks whether the output, relative to the publish directory, exists."""
+
+        return (self._publish_dir / output).exists()
+
+    def _remove_output(self, output: str):
+        """Removes the output, given relative to the publish directory."""
+
+        (self._publish_dir / output).unlink(missing_ok=True)
+
+    def _get_output_path(self, filepath: Path) -> Path:
+        """Returns the path in the publish directory that the source file is saved to."""
+
+        return self._publish_dir / (filepath.stem + ".html")
 
     def _get_directories(self) -> tuple[Path, Path, Path]:
         """Returns the project, content and publish directory paths."""
@@ -156,7 +1076,11 @@ class Generator:
 
     def _set_theme(self):
         """Creates the appropriate static directory with the theme related files
-        in the publish directory."""
+        in the publish directory. This only happens once per build and only the
+        theme files that changed since the last build are copied."""
+
+        if self._theme_synced:
+            return
 
         theme_name, theme_dir = self._get_theme_directory()
         if theme_name != self.theme:
@@ -166,7 +1090,10 @@ class Generator:
             )
 
         publish_static_dir = self._publish_dir / "static"
-        shutil.copytree(theme_dir, publish_static_dir, dirs_exist_ok=True)
+        with self.profiler.measure("theme"):
+            # The templates of the theme are rendered rather than published
+            sync_directory(theme_dir, publish_static_dir, exclude=[THEME_TEMPLATES_DIR])
+        self._theme_synced = True
 
     def _get_theme_directory(self) -> tuple[str, Path]:
         """Tries to find the directory with the files related to the theme.
@@ -176,9 +1103,12 @@ class Generator:
         if not templates_dir.exists():
             raise FileNotFoundError("'templates' directory was not found")
 
-        theme_dir = templates_dir / self.theme
-        if theme_dir.exists():
-            return self.theme, theme_dir
+        for theme_dir in (
+            templates_dir / self.theme,
+            templates_dir / "themes" / self.theme,
+        ):
+            if theme_dir.exists():
+                return self.theme, theme_dir
 
         default_theme = self._get_default_theme()
         default_dir = templates_dir / "themes" / default_theme
@@ -196,7 +1126,107 @@ class Generator:
         config = get_config()
         return config.get("theme", "default")
 
+    def _is_search_enabled(self) -> bool:
+        """Checks whether the project configuration asks for a search index."""
+
+        config = get_config()
+        return config.get("search", "false").lower() == "true"
+
+    def _get_page_size(self) -> int:
+        """Returns the number of articles per listing page set up in the project
+        configuration."""
+
+        config = get_config()
+        page_size = config.get("page_size", str(DEFAULT_PAGE_SIZE))
+        if not page_size.isdigit() or int(page_size) < 1:
+            raise exceptions.InvalidConfig(
+                "'page_size' in 'config.json' must be a positive number"
+            )
+        return int(page_size)
+
+    def _get_feed_size(self) -> int:
+        """Returns the number of articles in the feeds set up in the project
+        configuration."""
+
+        config = get_config()
+        feed_size = config.get("feed_size", str(DEFAULT_FEED_SIZE))
+        if not feed_size.isdigit() or int(feed_size) < 1:
+            raise exceptions.InvalidConfig(
+                "'feed_size' in 'config.json' must be a positive number"
+            )
+        return int(feed_size)
+
     def _get_page_template_name(self, filepath: Path) -> str:
         """Creates the page template name from the filename and returns it."""
 
         return filepath.stem + "_template.html"
+
+
+# ----- WORKER PROCESSES -----
+
+# The generator owned by a worker process of the pool used for parallel builds
+_worker_generator: Optional[Generator] = None
+
+
+def _init_worker(
+    theme: str,
+    full: bool,
+    profile: bool,
+    minify: bool,
+    publish_dir: Path,
+    shard: Optional[tuple[int, int]],
+    targets: list[tuple[str, Path]],
+    state_dir: Path,
+):
+    """Sets up the generator, and with it the parser and the templaters, once per
+    worker process. The state directory is passed along since the one of a staged
+    build can't be derived from the publish directory."""
+
+    global _worker_generator
+    _worker_generator = Generator(
+        theme,
+        full=full,
+        profile=profile,
+        minify=minify,
+        publish_dir=publish_dir,
+        shard=shard,
+        targets=targets,
+        state_dir=state_dir,
+    )
+
+
+def _generate_in_worker(method_name: str, filepath: Path) -> WorkerResult:
+    """Generates a single file in a worker process and reports the outcome back to
+    the parent process."""
+
+    generator = _worker_generator
+    assert generator is not None, "worker was not initialized"
+
+    skipped_files = generator.skipped_files
+    for target in generator._targets:
+        target.rendered_outputs.clear()
+    try:
+        getattr(generator, method_name)(filepath)
+    except (exceptions.NoMetadata, exceptions.InvalidMetadataSyntax) as e:
+        return WorkerResult(
+            error=type(e),
+            entry=None,
+            skipped=False,
+            events=generator.profiler.pop_events(),
+            search_document=None,
+            target_entries=[],
+        )
+
+    documents, generator._search_documents = generator._search_documents, []
+    return WorkerResult(
+        error=None,
+        entry=generator._manifest.get(filepath),
+        skipped=generator.skipped_files > skipped_files,
+        events=generator.profiler.pop_events(),
+        search_document=documents[0] if documents else None,
+        # Targets that skipped the file report no entry, as theirs didn't change
+        target_entries=[
+            target._manifest.get(filepath) if target.rendered_outputs else None
+            for target in generator._targets
+        ],
+    )
@@ -0,0 +1,277 @@
+# Standard library imports
+import os
+import json
+import sqlite3
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+# Local imports
+from generator.parser import Parser
+from generator.types import IndexEntry
+from generator.exceptions import NoMetadata, InvalidMetadataSyntax
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    source TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    output TEXT NOT NULL,
+    title TEXT NOT NULL,
+    date TEXT NOT NULL,
+    author TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS articles_date ON articles (date DESC, source);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    source TEXT NOT NULL REFERENCES articles (source) ON DELETE CASCADE,
+    PRIMARY KEY (tag, source)
+);
+CREATE INDEX IF NOT EXISTS tags_source ON tags (source);
+"""
+
+
+class MetadataIndex:
+    """Persistent SQLite index of the metadata of the articles.
+
+    The index is updated incrementally: only files whose size or modification time
+    changed are scanned again, and only their metadata is read. Listings can then be
+    built from the index without opening the articles."""
+
+    def __init__(self, filepath: Path, project_dir: Path):
+
+        self._project_dir: Path = project_dir
+        self._parser: Parser = Parser()
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._connection: sqlite3.Connection = sqlite3.connect(filepath)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def sync(
+        self,
+        filepaths: Iterable[Path],
+        root: Path,
+        get_output: Callable[[Path], str],
+    ) -> set[str]:
+        """Brings the index up to date with the given markdown files, which are all
+        the files within the root (a directory or a single file). Entries of files
+        within the root that weren't given are removed. Returns the keys of the
+        entries that were added, changed or removed; files whose metadata stayed the
+        same, e.g. because only their body was edited, aren't among them."""
+
+        root_key = self._key(root)
+        indexed = {
+            row["source"]: (row["mtime_ns"], row["size"])
+            for row in self._connection.execute(
+                "SELECT source, mtime_ns, size FROM articles"
+                " WHERE source = ? OR substr(source, 1, ?) = ?",
+                (root_key, len(root_key) + 1, root_key + "/"),
+            )
+        }
+
+        changed: set[str] = set()
+        seen: set[str] = set()
+        with self._connection:
+            for filepath in filepaths:
+                key = self._key(filepath)
+                seen.add(key)
+                stat = os.stat(filepath)
+                if indexed.get(key) == (stat.st_mtime_ns, stat.st_size):
+                    continue
+                previous = self._get_entry(key)
+                self._remove(key)
+                self._add(filepath, key, stat, get_output(filepath))
+                # Entries that are gone since the metadata became invalid differ too
+                if self._get_entry(key) != previous:
+                    changed.add(key)
+
+            for key in indexed.keys() - seen:
+                self._remove(key)
+                changed.add(key)
+
+        return changed
+
+    def retain(self, root: Path) -> set[str]:
+        """Removes the entries of the files outside the root directory. Returns the
+        keys of the removed entries."""
+
+        root_key = self._key(root)
+        removed = {
+            row["source"]
+            for row in self._connection.execute(
+                "SELECT source FROM articles WHERE substr(source, 1, ?) != ?",
+                (len(root_key) + 1, root_key + "/"),
+            )
+        }
+        with self._connection:
+            for key in removed:
+                self._remove(key)
+        return removed
+
+    def merge(self, filepaths: list[Path]):
+        """Replaces the contents of the index with the union of the given indexes,
+        e.g. the partial indexes of the shards of a build."""
+
+        with self._connection:
+            self._connection.execute("DELETE FROM articles")
+        for filepath in filepaths:
+            # Attaching can't happen within a transaction
+            self._connection.execute("ATTACH DATABASE ? AS shard", (str(filepath),))
+            try:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO articles SELECT * FROM shard.articles"
+                    )
+                    self._connection.execute(
+                        "INSERT OR IGNORE INTO tags SELECT * FROM shard.tags"
+                    )
+            finally:
+                self._connection.execute("DETACH DATABASE shard")
+
+    def articles(
+        self,
+        *,
+        tag: Optional[str] = None,
+        year: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> list[IndexEntry]:
+        """Returns the articles, newest first, optionally only the ones with the given
+        tag or from the given year."""
+
+        query, parameters = self._filter(tag, year)
+        query = "SELECT * FROM articles" + query + " ORDER BY date DESC, source"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            parameters += (limit, offset)
+        return [
+            self._create_entry(row)
+            for row in self._connection.execute(query, parameters)
+        ]
+
+    def count(self, *, tag: Optional[str] = None, year: Optional[str] = None) -> int:
+        """Returns the number of articles, optionally only the ones with the given tag
+        or from the given year."""
+
+        query, parameters = self._filter(tag, year)
+        row = self._connection.execute(
+            "SELECT count(*) FROM articles" + query, parameters
+        ).fetchone()
+        return row[0]
+
+    def tags(self) -> list[tuple[str, int]]:
+        """Returns every tag along with the number of articles that have it."""
+
+        return [
+            (row["tag"], row["count"])
+            for row in self._connection.execute(
+                "SELECT tag, count(*) AS count FROM tags GROUP BY tag ORDER BY tag"
+            )
+        ]
+
+    def years(self) -> list[tuple[str, int]]:
+        """Returns every year with articles along with the number of articles."""
+
+        return [
+            (row["year"], row["count"])
+            for row in self._connection.execute(
+                "SELECT substr(date, 1, 4) AS year, count(*) AS count FROM articles"
+                " WHERE date != '' GROUP BY year ORDER BY year DESC"
+            )
+        ]
+
+    def get(self, key: str) -> Optional[IndexEntry]:
+        """Returns the entry of the source, if it's indexed."""
+
+        row = self._connection.execute(
+            "SELECT * FROM articles WHERE source = ?", (key,)
+        ).fetchone()
+        return self._create_entry(row) if row else None
+
+    def close(self):
+
+        self._connection.close()
+
+    # ----- HELPER METHODS -----
+    def _add(self, filepath: Path, key: str, stat: os.stat_result, output: str) -> bool:
+        """Scans the metadata of the file and adds it to the index. Returns whether
+        the file could be indexed."""
+
+        try:
+            metadata = self._parser.parse_metadata(filepath)
+        except (NoMetadata, InvalidMetadataSyntax):
+            return False
+
+        tags = self._split_tags(metadata.get("tags", ""))
+        self._connection.execute(
+            "INSERT INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                key,
+                stat.st_mtime_ns,
+                stat.st_size,
+                output,
+                metadata.get("title", ""),
+                metadata.get("date", ""),
+                metadata.get("author", ""),
+                json.dumps(tags),
+                json.dumps(metadata),
+            ),
+        )
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO tags VALUES (?, ?)", ((tag, key) for tag in tags)
+        )
+        return True
+
+    def _get_entry(self, key: str) -> Optional[IndexEntry]:
+
+        row = self._connection.execute(
+            "SELECT * FROM articles WHERE source = ?", (key,)
+        ).fetchone()
+        return self._create_entry(row) if row is not None else None
+
+    def _remove(self, key: str):
+
+        self._connection.execute("DELETE FROM articles WHERE source = ?", (key,))
+
+    def _filter(self, tag: Optional[str], year: Optional[str]) -> tuple[str, tuple]:
+        """Returns the WHERE clause and its parameters for the filters."""
+
+        conditions: list[str] = []
+        parameters: tuple = ()
+        if tag is not None:
+            conditions.append("source IN (SELECT source FROM tags WHERE tag = ?)")
+            parameters += (tag,)
+        if year is not None:
+            conditions.append("substr(date, 1, 4) = ?")
+            parameters += (year,)
+        if not conditions:
+            return "", parameters
+        return " WHERE " + " AND ".join(conditions), parameters
+
+    def _create_entry(self, row: sqlite3.Row) -> IndexEntry:
+
+        return IndexEntry(
+            source=row["source"],
+            output=row["output"],
+            title=row["title"],
+            date=row["date"],
+            author=row["author"],
+            tags=json.loads(row["tags"]),
+            metadata=json.loads(row["metadata"]),
+        )
+
+    def _split_tags(self, tags: str) -> list[str]:
+
+        return sorted({tag.strip() for tag in tags.split(",") if tag.strip()})
+
+    def _key(self, filepath: Path) -> str:
+        """Returns the key the file is stored under, in the same form as the keys of
+        the build manifest."""
+
+        try:
+            return filepath.relative_to(self._project_dir).as_posix()
+        except ValueError:
+            return filepath.as_posix()
@@ -0,0 +1,286 @@
+# Standard library imports
+import re
+import json
+import hashlib
+import posixpath
+from pathlib import Path
+from typing import Iterable, Optional
+
+# Local imports
+from generator.index import MetadataIndex
+from generator.types import IndexEntry, ListingLink, ListingPage
+
+
+# ----- CONSTANTS -----
+
+DEFAULT_PAGE_SIZE = 10
+
+
+class Listings:
+    """Paginated listings of the articles built from the metadata index: the blog
+    index, a listing per tag and a listing per year, along with the pages linking to
+    the listings of the tags and the years.
+
+    The pages of a listing are numbered from the oldest articles, so a new article only
+    changes the first page (and the page that used to follow it once a new page is
+    needed) instead of shifting every page. The digests of the generated pages are kept
+    so that only the pages whose contents changed are rendered again. The number of
+    articles of every listing and the articles that changed since the listings were
+    last generated are kept as well, so that only the listings they affect have to be
+    looked at. Listings without a file are only kept in memory."""
+
+    def __init__(self, index: MetadataIndex, filepath: Optional[Path], page_size: int):
+
+        self._index: MetadataIndex = index
+        self._filepath: Optional[Path] = filepath
+        self._page_size: int = page_size
+        state = self._load()
+        self._digests: dict[str, str] = state.get("pages", {})
+        # Digest of everything besides the articles that the pages depend on, e.g.
+        # the templates
+        self._context: str = state.get("context", "")
+        self._counts: dict[str, int] = state.get("counts", {})
+        self._pending: set[str] = set(state.get("pending", []))
+
+    def pages(self) -> list[ListingPage]:
+        """Returns every listing page. The articles are read from the index once and
+        grouped by tag and year here."""
+
+        articles = self._index.articles()
+        tags: dict[str, list[IndexEntry]] = {}
+        years: dict[str, list[IndexEntry]] = {}
+        for article in articles:
+            for tag in article.tags:
+                tags.setdefault(tag, []).append(article)
+            if article.date:
+                years.setdefault(article.date[:4], []).append(article)
+
+        pages = self._paginate("blog", "Blog", "../", articles)
+
+        slugs = self._slugify_tags(tags)
+        pages.append(
+            self._create_overview(
+                "tags/index.html",
+                "Tags",
+                [
+                    ListingLink(tag, f"{slugs[tag]}/index.html", len(tagged))
+                    for tag, tagged in sorted(tags.items())
+                ],
+            )
+        )
+        for tag, tagged in sorted(tags.items()):
+            pages.extend(
+                self._paginate(
+                    f"tags/{slugs[tag]}", f"Tagged '{tag}'", "../../", tagged
+                )
+            )
+
+        pages.append(
+            self._create_overview(
+                "archive/index.html",
+                "Archive",
+                [
+                    ListingLink(year, f"{year}/index.html", len(dated))
+                    for year, dated in sorted(years.items(), reverse=True)
+                ],
+            )
+        )
+        for year, dated in sorted(years.items(), reverse=True):
+            pages.extend(
+                self._paginate(
+                    f"archive/{year}", f"Articles from {year}", "../../", dated
+                )
+            )
+
+        return pages
+
+    def defer(self, sources: set[str]):
+        """Records the keys of articles whose entries in the index changed, until the
+        listings are generated again."""
+
+        self._pending.update(sources)
+
+    def is_current(self, context: str) -> bool:
+        """Checks whether the listings were generated with the same context and no
+        article changed since."""
+
+        return self._context == context and not self._pending
+
+    def affected(self, pages: list[ListingPage], context: str) -> Optional[set[str]]:
+        """Returns the directories of the listings whose pages may differ from the
+        ones generated last: the listings holding changed articles, the listings
+        whose number of articles changed and the overviews. Returns None if every
+        listing is affected, since the context changed."""
+
+        if self._context != context:
+            return None
+
+        directories: set[str] = set()
+        for directory, articles in self._group(pages).items():
+            if self._counts.get(directory) != len(articles) or any(
+                article.source in self._pending for article in articles
+            ):
+                directories.add(directory)
+        # The overviews link to every listing of their kind along with its size
+        directories.update(("tags", "archive"))
+        return directories
+
+    def update(self, pages: list[ListingPage], context: str):
+        """Records that the given pages were generated with the context."""
+
+        self._context = context
+        self._counts = {
+            directory: len(articles)
+            for directory, articles in self._group(pages).items()
+        }
+        self._pending.clear()
+
+    def digest(self, output: str) -> Optional[str]:
+        """Returns the digest recorded for the page when it was last generated."""
+
+        return self._digests.get(output)
+
+    def outputs(self) -> list[str]:
+        """Returns the outputs of the pages generated so far."""
+
+        return list(self._digests)
+
+    def record(self, output: str, digest: str):
+        """Records the digest of a generated page."""
+
+        self._digests[output] = digest
+
+    def remove_stale(self, outputs: set[str]) -> list[str]:
+        """Forgets the recorded pages that aren't among the given outputs anymore and
+        returns them."""
+
+        stale_outputs = [output for output in self._digests if output not in outputs]
+        for output in stale_outputs:
+            del self._digests[output]
+        return stale_outputs
+
+    def save(self):
+        """Writes the digests of the generated pages and the rest of the state to
+        disk, unless the listings are only kept in memory."""
+
+        if self._filepath is None:
+            return
+
+        state = {
+            "context": self._context,
+            "counts": self._counts,
+            "pending": sorted(self._pending),
+            "pages": self._digests,
+        }
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._filepath, "w+") as f:
+            f.seek(0)
+            json.dump(state, f, indent=1, sort_keys=True)
+
+    # ----- HELPER METHODS -----
+    def _paginate(
+        self, directory: str, title: str, root: str, articles: list[IndexEntry]
+    ) -> list[ListingPage]:
+        """Splits the articles, newest first, into the pages of a listing. The first
+        page is saved as 'index.html' and holds the newest articles that don't fill a
+        complete page, and the older pages are numbered from the oldest one."""
+
+        size = self._page_size
+        count = max(1, (len(articles) + size - 1) // size)
+        first_size = len(articles) - (count - 1) * size
+
+        pages: list[ListingPage] = []
+        for number in range(count, 0, -1):
+            if number == count:
+                start, end = 0, first_size
+            else:
+                start = first_size + (count - 1 - number) * size
+                end = start + size
+
+            if number == count:
+                newer = None
+            elif number + 1 == count:
+                newer = "index.html"
+            else:
+                newer = f"{number + 1}.html"
+
+            name = "index.html" if number == count else f"{number}.html"
+            pages.append(
+                ListingPage(
+                    output=f"{directory}/{name}",
+                    title=title,
+                    root=root,
+                    page=number,
+                    articles=articles[start:end],
+                    links=[],
+                    newer=newer,
+                    older=f"{number - 1}.html" if number > 1 else None,
+                )
+            )
+
+        return pages
+
+    def _create_overview(
+        self, output: str, title: str, links: list[ListingLink]
+    ) -> ListingPage:
+        """Returns a page that links to other listings."""
+
+        return ListingPage(
+            output=output,
+            title=title,
+            root="../",
+            page=1,
+            articles=[],
+            links=links,
+            newer=None,
+            older=None,
+        )
+
+    def _slugify_tags(self, tags: Iterable[str]) -> dict[str, str]:
+        """Returns the names of the directories the listings of the tags are saved to.
+        Tags that slugify to the same name, e.g. 'C++' and 'C#', get a short hash of
+        the tag appended so that their listings don't overwrite each other."""
+
+        tags_by_slug: dict[str, list[str]] = {}
+        for tag in tags:
+            tags_by_slug.setdefault(self._slugify(tag), []).append(tag)
+
+        slugs: dict[str, str] = {}
+        for slug, slug_tags in tags_by_slug.items():
+            for tag in slug_tags:
+                if len(slug_tags) == 1:
+                    slugs[tag] = slug
+                else:
+                    digest = hashlib.sha256(tag.encode("utf-8")).hexdigest()[:8]
+                    slugs[tag] = f"{slug}-{digest}"
+        return slugs
+
+    def _slugify(self, tag: str) -> str:
+        """Returns the name of the directory the listing of the tag is saved to."""
+
+        return re.sub(r"[^a-z0-9]+", "-", tag.lower()).strip("-") or "tag"
+
+    def _group(self, pages: list[ListingPage]) -> dict[str, list[IndexEntry]]:
+        """Returns the articles of every listing by the directory of the listing."""
+
+        listings: dict[str, list[IndexEntry]] = {}
+        for page in pages:
+            listings.setdefault(posixpath.dirname(page.output), []).extend(
+                page.articles
+            )
+        return listings
+
+    def _load(self) -> dict:
+        """Reads the recorded state from disk. A missing or corrupt file, or one
+        written before the state held more than the digests, means every page is
+        generated again."""
+
+        if self._filepath is None:
+            return {}
+        try:
+            with open(self._filepath, "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+        return state if isinstance(state, dict) and "pages" in state else {}
@@ -0,0 +1,103 @@
+# Standard library imports
+import json
+from pathlib import Path
+from typing import Optional
+
+# Local imports
+from generator.types import ManifestEntry
+
+
+class Manifest:
+    """Persistent record of the inputs that produced each file in the publish directory.
+
+    Entries are keyed by the source path relative to the project directory so that the
+    manifest stays valid if the project directory is moved."""
+
+    def __init__(self, filepath: Path, project_dir: Path):
+
+        self._filepath: Path = filepath
+        self._project_dir: Path = project_dir
+        self._entries: dict[str, ManifestEntry] = self._load()
+
+    def get(self, source: Path) -> Optional[ManifestEntry]:
+        """Returns the entry recorded for the source file, if any."""
+
+        return self._entries.get(self.key(source))
+
+    def update(self, source: Path, entry: ManifestEntry):
+        """Records the entry for the source file."""
+
+        self._entries[self.key(source)] = entry
+
+    def merge(self, other: "Manifest"):
+        """Records every entry of the other manifest, e.g. the partial manifest of a
+        shard."""
+
+        self._entries.update(other._entries)
+
+    def sources(self) -> list[str]:
+        """Returns the keys of all the recorded sources."""
+
+        return list(self._entries)
+
+    def remove(self, source: str) -> Optional[ManifestEntry]:
+        """Removes and returns the entry stored under the given key."""
+
+        return self._entries.pop(source, None)
+
+    def sources_under(self, dirpath: Path) -> list[str]:
+        """Returns the keys of all the recorded sources within the given directory."""
+
+        prefix = self.key(dirpath) + "/"
+        return [source for source in self._entries if source.startswith(prefix)]
+
+    def sources_using(self, template: str) -> list[str]:
+        """Returns the keys of all the recorded sources that were rendered with the
+        template, directly or through another template."""
+
+        return [
+            source
+            for source, entry in self._entries.items()
+            if template in entry["templates"]
+        ]
+
+    def sources_with_assets(self) -> list[str]:
+        """Returns the keys of all the recorded sources whose templates link to
+        assets."""
+
+        return [
+            source for source, entry in self._entries.items() if entry.get("assets")
+        ]
+
+    def outputs(self) -> set[str]:
+        """Returns the output paths of all the recorded sources."""
+
+        return {entry["output"] for entry in self._entries.values()}
+
+    def save(self):
+        """Writes the manifest to disk."""
+
+        self._filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(self._filepath, "w+") as f:
+            f.seek(0)
+            json.dump(self._entries, f)
+
+    def key(self, source: Path) -> str:
+        """Returns the key used to store the source file."""
+
+        try:
+            return source.relative_to(self._project_dir).as_posix()
+        except ValueError:
+            return source.as_posix()
+
+    def _load(self) -> dict[str, ManifestEntry]:
+        """Loads the manifest from disk. A missing or unreadable manifest is treated
+        as an empty one, which results in a full rebuild."""
+
+        if not self._filepath.exists():
+            return {}
+        try:
+            with open(self._filepath, "r") as f:
+                return json.load(f)
+        except json.JSONDecodeError:
+            return {}
@@ -1,5 +1,7 @@
 # Standard library imports
+import io
 from pathlib import Path
+from typing import Iterable, Iterator
 
 # Local imports
 from generator.types import PartitionedType, ParsedFileData
@@ -12,11 +14,23 @@ class Parser:
     def parse(self, filepath: Path) -> ParsedFileData:
 
         partitioned_file_contents = self._partition_file_content(filepath)
+        return self._create_parsed_data(partitioned_file_contents)
+
+    def parse_source(self, source: str) -> ParsedFileData:
+        """Parses the contents of a markdown file that was already read."""
+
+        partitioned_contents = self._partition_lines(io.StringIO(source))
+        return self._create_parsed_data(partitioned_contents)
+
+    def _create_parsed_data(
+        self, partitioned_contents: PartitionedType
+    ) -> ParsedFileData:
+
         # This returns a dictionary and not a ParsedFileData object at runtime
         # For more information, refer: PEP 589 (https://peps.python.org/pep-0589/)
         return ParsedFileData(
-            content=partitioned_file_contents["content"],
-            metadata=self._parse_metadata(partitioned_file_contents["metadata"]),
+            content=partitioned_contents["content"],
+            metadata=self._parse_metadata(partitioned_contents["metadata"]),
         )
 
     def _partition_file_content(self, filepath: str | Path) -> PartitionedType:
@@ -24,28 +38,49 @@ class Parser:
         strings."""
 
         with open(filepath, "r") as f:
-            metadata_exists = False
-            metadata = []
-
-            # Reading all the lines until the metadata starts
-            for line in f:
-                if line.startswith("---"):
-                    metadata_exists = True
-                    break
-            if not metadata_exists:
-                raise NoMetadata()
-
-            # Getting the metadata
-            for line in f:
-                # End of metadata
-                if line.startswith("---"):
-                    break
-                metadata.append(line.rstrip("\n"))  # type: ignore
-
-            # The rest of the lines would be the content
-            content = "".join(f)
+            return self._partition_lines(f)
+
+    def parse_metadata(self, filepath: Path) -> dict[str, str]:
+        """Parses only the metadata of the file. The file is read up to the end of the
+        metadata and the rest of it is never loaded."""
+
+        with open(filepath, "r") as f:
+            return self._parse_metadata(self._read_metadata(f))
+
+    def _partition_lines(self, lines: Iterable[str]) -> PartitionedType:
+        """Returns the metadata and the contents of the given lines of a file."""
+
+        lines_iterator: Iterator[str] = iter(lines)
+        metadata = self._read_metadata(lines_iterator)
+
+        # The rest of the lines would be the content
+        content = "".join(lines_iterator)
         return {"metadata": metadata, "content": content}
 
+    def _read_metadata(self, lines: Iterator[str]) -> list[str]:
+        """Consumes the lines up to the end of the metadata and returns the lines of
+        the metadata."""
+
+        metadata_exists = False
+        metadata = []
+
+        # Reading all the lines until the metadata starts
+        for line in lines:
+            if line.startswith("---"):
+                metadata_exists = True
+                break
+        if not metadata_exists:
+            raise NoMetadata()
+
+        # Getting the metadata
+        for line in lines:
+            # End of metadata
+            if line.startswith("---"):
+                break
+            metadata.append(line.rstrip("\n"))  # type: ignore
+
+        return metadata
+
     def _parse_metadata(self, metadata: list[str]) -> dict[str, str]:
         """Parses the metadata and returns a dictionary containing
         the key value pairs as per the metadata."""
@@ -0,0 +1,107 @@
+# Standard library imports
+import queue
+import threading
+from pathlib import Path
+from itertools import islice
+from collections import deque
+from typing import Callable, Iterator, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+
+# Local imports
+from generator.profiler import Profiler
+
+
+# ----- CONSTANTS -----
+
+IO_THREADS = 4
+# Number of files read ahead of, or waiting to be written after, the file being
+# rendered. This bounds the memory used however large the site is.
+QUEUE_DEPTH = 64
+
+
+def prefetch(
+    filepaths: list[Path],
+    profiler: Profiler,
+    *,
+    threads: int = IO_THREADS,
+    depth: int = QUEUE_DEPTH,
+) -> Iterator[tuple[Path, str]]:
+    """Reads the files on a pool of I/O threads ahead of the consumer and yields
+    their contents in order. At most `depth` files are held in memory at a time."""
+
+    def read(filepath: Path) -> str:
+        with profiler.measure("read", filepath):
+            with open(filepath, "r") as f:
+                return f.read()
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        remaining = iter(filepaths)
+        pending: deque[tuple[Path, Future[str]]] = deque(
+            (filepath, executor.submit(read, filepath))
+            for filepath in islice(remaining, depth)
+        )
+        while pending:
+            filepath, future = pending.popleft()
+            next_filepath = next(remaining, None)
+            if next_filepath is not None:
+                pending.append((next_filepath, executor.submit(read, next_filepath)))
+            yield filepath, future.result()
+
+
+class BackgroundWriter:
+    """Writes files on a pool of I/O threads while the caller keeps rendering. The
+    queue of pending writes is bounded, so the caller blocks instead of piling up
+    rendered files in memory when the disk can't keep up."""
+
+    def __init__(
+        self,
+        write: Callable[[Path, str], None],
+        profiler: Profiler,
+        *,
+        threads: int = IO_THREADS,
+        depth: int = QUEUE_DEPTH,
+    ):
+
+        self._write: Callable[[Path, str], None] = write
+        self._profiler: Profiler = profiler
+        self._queue: queue.Queue[Optional[tuple[Path, str]]] = queue.Queue(depth)
+        self._error: Optional[BaseException] = None
+        self._threads: list[threading.Thread] = [
+            threading.Thread(target=self._run, daemon=True) for _ in range(threads)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def write(self, filepath: Path, content: str):
+        """Queues the content to be written to the file."""
+
+        self._raise_error()
+        self._queue.put((filepath, content))
+
+    def close(self):
+        """Waits for the queued writes to finish. Raises the first error that occurred
+        while writing."""
+
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._raise_error()
+
+    def _run(self):
+
+        while (item := self._queue.get()) is not None:
+            filepath, content = item
+            # Draining the queue after an error so that the caller never blocks
+            if self._error is not None:
+                continue
+            try:
+                with self._profiler.measure("write", filepath):
+                    self._write(filepath, content)
+            except BaseException as e:
+                self._error = e
+
+    def _raise_error(self):
+
+        if self._error is not None:
+            raise self._error
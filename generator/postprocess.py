@@ -0,0 +1,111 @@
+# Standard library imports
+import os
+import re
+import zlib
+from pathlib import Path
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+
+# Local imports
+from generator.publish import write_atomic
+from generator.types import CompressStats
+
+
+# ----- CONSTANTS -----
+
+# Blocks whose whitespace is significant or that aren't HTML
+PRESERVED_BLOCK = re.compile(
+    r"<(pre|code|textarea|script|style)\b.*?</\1\s*>", re.DOTALL | re.IGNORECASE
+)
+# Conditional comments are kept since some browsers act on them
+HTML_COMMENT = re.compile(r"<!--(?!\[if).*?-->", re.DOTALL)
+NEWLINE_RUN = re.compile(r"\s*\n\s*")
+WHITESPACE_RUN = re.compile(r"[ \t\r\f\v]{2,}|[\t\r\f\v]")
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".json", ".xml", ".svg", ".txt")
+# Smaller files aren't worth it, the gzip header would eat most of the savings
+MIN_COMPRESSED_SIZE = 256
+
+
+def minify_html(html: str) -> str:
+    """Removes comments and collapses runs of whitespace into a single space, or a
+    single newline if the run spanned lines. The contents of `pre`, `code`,
+    `textarea`, `script` and `style` elements are left untouched. Whitespace is never
+    removed entirely since it's significant between inline elements."""
+
+    minified: list[str] = []
+    position = 0
+    for match in PRESERVED_BLOCK.finditer(html):
+        minified.append(_collapse(html[position : match.start()]))
+        minified.append(match.group(0))
+        position = match.end()
+    minified.append(_collapse(html[position:]))
+    return "".join(minified).strip()
+
+
+def precompress(directory: Path, *, threads: Optional[int] = None) -> CompressStats:
+    """Saves a gzipped sibling (`<file>.gz`) of every compressible file in the
+    directory at the highest compression level, so that the server doesn't have to
+    compress them on every request. Siblings that are at least as new as their file
+    are skipped and siblings of deleted files are removed. The files are compressed on
+    a pool of threads since zlib releases the GIL."""
+
+    pending: list[Path] = []
+    skipped = removed = 0
+    for dirpath, _, filenames in os.walk(directory):
+        names = set(filenames)
+        for filename in filenames:
+            filepath = Path(dirpath) / filename
+            if filename.endswith(".gz"):
+                source = filename[:-3]
+                if source.endswith(COMPRESSIBLE_EXTENSIONS) and source not in names:
+                    filepath.unlink()
+                    removed += 1
+                continue
+            if not filename.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+
+            has_sibling = filename + ".gz" in names
+            stat = filepath.stat()
+            if stat.st_size < MIN_COMPRESSED_SIZE:
+                if has_sibling:
+                    Path(str(filepath) + ".gz").unlink()
+                    removed += 1
+            elif has_sibling and _is_compressed(filepath, stat):
+                skipped += 1
+            else:
+                pending.append(filepath)
+
+    with ThreadPoolExecutor(max_workers=threads or os.cpu_count()) as executor:
+        # Consuming the results so that errors are raised
+        list(executor.map(_compress, pending))
+
+    return CompressStats(compressed=len(pending), skipped=skipped, removed=removed)
+
+
+# ----- HELPER METHODS -----
+def _collapse(html: str) -> str:
+
+    html = HTML_COMMENT.sub("", html)
+    html = NEWLINE_RUN.sub("\n", html)
+    return WHITESPACE_RUN.sub(" ", html)
+
+
+def _is_compressed(filepath: Path, stat: os.stat_result) -> bool:
+    """Checks whether the gzipped sibling of the file is at least as new as the
+    file."""
+
+    return os.stat(str(filepath) + ".gz").st_mtime_ns >= stat.st_mtime_ns
+
+
+def _compress(filepath: Path):
+    """Writes the gzipped sibling of the file atomically, so that the server never
+    serves a half written one."""
+
+    with open(filepath, "rb") as f:
+        content = f.read()
+    # 31 selects the gzip container; the header holds no timestamp, so the output
+    # only depends on the content
+    compressor = zlib.compressobj(9, zlib.DEFLATED, 31)
+    compressed = compressor.compress(content) + compressor.flush()
+    write_atomic(Path(str(filepath) + ".gz"), compressed)
@@ -0,0 +1,111 @@
+# Standard library imports
+import os
+import json
+import time
+from pathlib import Path
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import ContextManager, Iterator, Optional
+
+# External library imports
+import typer
+
+# Local imports
+from generator.types import ProfileEvent
+
+
+class Profiler:
+    """Records how long each stage of the build takes, per file where the stage works
+    on a single file. A disabled profiler records nothing."""
+
+    def __init__(self, enabled: bool = True):
+
+        self.enabled: bool = enabled
+        self._events: list[ProfileEvent] = []
+
+    def measure(self, stage: str, filepath: Optional[Path] = None) -> ContextManager:
+        """Returns a context manager that records the time spent in its body."""
+
+        if not self.enabled:
+            return nullcontext()
+        return self._measure(stage, filepath)
+
+    def add_events(self, events: list[ProfileEvent]):
+        """Adds the events recorded by another profiler, e.g. in a worker process."""
+
+        self._events.extend(events)
+
+    def pop_events(self) -> list[ProfileEvent]:
+        """Returns the recorded events and forgets them."""
+
+        events, self._events = self._events, []
+        return events
+
+    def print_report(self, slowest: int = 10):
+        """Prints the total time spent in each stage and the slowest files."""
+
+        stage_totals: dict[str, int] = defaultdict(int)
+        stage_counts: dict[str, int] = defaultdict(int)
+        file_totals: dict[str, int] = defaultdict(int)
+        for event in self._events:
+            stage_totals[event.stage] += event.duration_ns
+            stage_counts[event.stage] += 1
+            if event.filepath:
+                file_totals[event.filepath] += event.duration_ns
+
+        # Stages run in parallel in worker processes, so the total can be more than
+        # the wall clock time of the build
+        total = sum(stage_totals.values()) or 1
+        typer.secho("\nTime spent per stage:\n", fg="blue")
+        for stage, duration in sorted(
+            stage_totals.items(), key=lambda item: item[1], reverse=True
+        ):
+            typer.secho(
+                f"{stage:<12} {duration / 1e6:>10.1f} ms {duration / total:>7.1%}"
+                f"   ({stage_counts[stage]} calls)"
+            )
+
+        if not file_totals:
+            return
+        typer.secho(f"\nSlowest {slowest} files:\n", fg="blue")
+        slowest_files = sorted(file_totals.items(), key=lambda item: item[1])
+        for filepath, duration in reversed(slowest_files[-slowest:]):
+            typer.secho(f"{duration / 1e6:>10.2f} ms  {filepath}")
+
+    def save_trace(self, filepath: Path):
+        """Saves the events in the Chrome trace event format, which can be opened
+        in chrome://tracing or Perfetto."""
+
+        trace_events = [
+            {
+                "name": event.stage,
+                "cat": "build",
+                "ph": "X",
+                "ts": event.start_ns / 1000,
+                "dur": event.duration_ns / 1000,
+                "pid": event.pid,
+                "tid": event.pid,
+                "args": {"file": event.filepath},
+            }
+            for event in self._events
+        ]
+        with open(filepath, "w+") as f:
+            f.seek(0)
+            json.dump({"traceEvents": trace_events}, f)
+
+    @contextmanager
+    def _measure(self, stage: str, filepath: Optional[Path]) -> Iterator[None]:
+
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._events.append(
+                ProfileEvent(
+                    stage=stage,
+                    filepath=str(filepath) if filepath else "",
+                    start_ns=start,
+                    duration_ns=time.perf_counter_ns() - start,
+                    pid=os.getpid(),
+                )
+            )
@@ -0,0 +1,117 @@
+# Standard library imports
+import os
+import errno
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterator
+from contextlib import contextmanager
+
+
+# ----- CONSTANTS -----
+
+# Values from <fcntl.h> and <linux/fs.h> used with renameat2
+AT_FDCWD = -100
+RENAME_EXCHANGE = 1 << 1
+
+
+def write_atomic(filepath: Path, content: bytes):
+    """Writes the file through a temporary file in the same directory that's renamed
+    over it, so that readers never see a half written file and a crash never leaves
+    one behind."""
+
+    with open_atomic(filepath) as f:
+        f.write(content)
+
+
+@contextmanager
+def open_atomic(filepath: Path) -> Iterator[BinaryIO]:
+    """Opens a temporary file in the same directory for writing that's renamed over
+    the file once the block exits, or removed if the block raises. Lets large files
+    be streamed to disk with the guarantees of `write_atomic`."""
+
+    fd, temp_path = tempfile.mkstemp(dir=filepath.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        # The temporary file is only readable by its owner
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, filepath)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def write_if_changed(filepath: Path, content: bytes) -> bool:
+    """Writes the file atomically unless it already holds the same content, in which
+    case it's left untouched along with its modification time. Returns whether the
+    file was written."""
+
+    try:
+        if filepath.stat().st_size == len(content):
+            with open(filepath, "rb") as f:
+                if f.read() == content:
+                    return False
+    except FileNotFoundError:
+        pass
+
+    write_atomic(filepath, content)
+    return True
+
+
+def clone_directory(source: Path, destination: Path):
+    """Recreates the directory tree at the destination with hard links to the files
+    of the source. Files are copied if they can't be linked. The clone may be
+    modified freely as long as files are replaced rather than written in place, which
+    is what `write_atomic` does."""
+
+    if destination.exists():
+        shutil.rmtree(destination)
+    shutil.copytree(source, destination, copy_function=_link_or_copy, symlinks=True)
+
+
+def exchange_directories(first: Path, second: Path):
+    """Swaps the two directories. On Linux both are swapped in a single step with
+    renameat2, so there's never a moment where neither exists. Elsewhere they're
+    swapped with three renames."""
+
+    if _rename_exchange(first, second):
+        return
+
+    temp_path = first.with_name(f".{first.name}.swap")
+    os.rename(first, temp_path)
+    os.rename(second, first)
+    os.rename(temp_path, second)
+
+
+# ----- HELPER METHODS -----
+def _link_or_copy(source: str, destination: str):
+
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def _rename_exchange(first: Path, second: Path) -> bool:
+    """Atomically swaps the two paths with renameat2. Returns False if the platform
+    or the filesystem doesn't support it."""
+
+    try:
+        import ctypes
+
+        libc = ctypes.CDLL(None, use_errno=True)
+        renameat2 = libc.renameat2
+    except (ImportError, OSError, AttributeError):  # Not Linux or an old glibc
+        return False
+
+    result = renameat2(
+        AT_FDCWD, os.fsencode(first), AT_FDCWD, os.fsencode(second), RENAME_EXCHANGE
+    )
+    if result == 0:
+        return True
+
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS, errno.EOPNOTSUPP):
+        return False
+    raise OSError(error, os.strerror(error), str(first), None, str(second))
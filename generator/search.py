@@ -0,0 +1,359 @@
+# Standard library imports
+import re
+import html
+import json
+import sqlite3
+import hashlib
+from pathlib import Path
+from typing import Iterable
+from collections import Counter
+
+# Local imports
+from generator.publish import write_if_changed
+from generator.types import SearchDocument
+
+
+# ----- CONSTANTS -----
+
+# Terms are sharded by their first characters, so a query only downloads the shards
+# of the prefixes of its words
+PREFIX_LENGTH = 2
+DOCUMENTS_PER_SHARD = 1000
+MAX_TERM_LENGTH = 32
+# Weights of a term in the title and in the other metadata relative to an occurrence
+# in the body
+TITLE_WEIGHT = 10
+METADATA_WEIGHT = 3
+
+TOKEN = re.compile(r"[^\W_]{2,}")
+HTML_TAG = re.compile(r"<[^>]*>")
+STOP_WORDS = frozenset(
+    (
+        "an and are as at be but by for from has have he in is it its of on or that "
+        "the this to was were will with you your"
+    ).split()
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT UNIQUE NOT NULL,
+    url TEXT NOT NULL,
+    title TEXT NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    document INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    weight INTEGER NOT NULL,
+    PRIMARY KEY (term, document)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_document ON postings (document);
+CREATE TABLE IF NOT EXISTS dirty (
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    PRIMARY KEY (kind, name)
+);
+"""
+
+
+class SearchIndex:
+    """Inverted index of the articles that's searched in the browser.
+
+    The postings are kept in SQLite so that a changed article only replaces its own
+    postings. The index is published as JSON shards: `terms/<prefix>.json` maps the
+    terms starting with the prefix to their documents and weights, and
+    `docs/<number>.json` maps the ids of the documents to their URLs and titles. Only
+    the shards that an update touched are written again, and `meta.json` holds what
+    the client needs to find the shards."""
+
+    def __init__(self, filepath: Path, output_dir: Path):
+
+        self._output_dir: Path = output_dir
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        self._connection: sqlite3.Connection = sqlite3.connect(filepath)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def update(self, documents: Iterable[SearchDocument]) -> int:
+        """Replaces the postings of the documents in a single transaction. Documents
+        whose URL, title and terms didn't change are left alone. Returns the number of
+        documents that changed."""
+
+        changed = 0
+        with self._connection:
+            for document in documents:
+                if self._update(document):
+                    changed += 1
+        return changed
+
+    def sources(self) -> set[str]:
+        """Returns the keys of the indexed sources."""
+
+        return {
+            row[0] for row in self._connection.execute("SELECT source FROM documents")
+        }
+
+    def prune(self, root: str, sources: set[str]) -> int:
+        """Removes the documents of the sources within the root (a directory or a
+        single file) that aren't among the given ones. Returns the number of removed
+        documents."""
+
+        stale = [
+            (document_id, source)
+            for document_id, source in self._connection.execute(
+                "SELECT id, source FROM documents"
+                " WHERE source = ? OR substr(source, 1, ?) = ?",
+                (root, len(root) + 1, root + "/"),
+            )
+            if source not in sources
+        ]
+        self._remove([document_id for document_id, _ in stale])
+        return len(stale)
+
+    def merge(self, filepaths: list[Path]):
+        """Brings the index in line with the union of the given indexes, e.g. the
+        partial indexes of the shards of a build. Only documents that differ are
+        replaced, so the shards of unchanged documents aren't written again."""
+
+        sources: set[str] = set()
+        for filepath in filepaths:
+            shard = sqlite3.connect(filepath)
+            try:
+                changed: list[SearchDocument] = []
+                for document_id, source, url, title, digest in shard.execute(
+                    "SELECT id, source, url, title, digest FROM documents"
+                ):
+                    sources.add(source)
+                    row = self._connection.execute(
+                        "SELECT digest FROM documents WHERE source = ?", (source,)
+                    ).fetchone()
+                    if row is not None and row[0] == digest:
+                        continue
+                    terms = dict(
+                        shard.execute(
+                            "SELECT term, weight FROM postings WHERE document = ?",
+                            (document_id,),
+                        )
+                    )
+                    changed.append(SearchDocument(source, url, title, terms))
+                self.update(changed)
+            finally:
+                shard.close()
+
+        # Every source belongs to exactly one shard, so anything else was deleted
+        self._remove(
+            [
+                document_id
+                for document_id, source in self._connection.execute(
+                    "SELECT id, source FROM documents"
+                )
+                if source not in sources
+            ]
+        )
+
+    def write(self, full: bool = False) -> int:
+        """Writes the shards touched since the last write and the metadata of the
+        index. Every shard is written, and the files of shards that no longer exist
+        are removed, when asked to or when the output directory doesn't hold an index
+        yet. Returns the number of shards written or removed."""
+
+        full = full or not (self._output_dir / "meta.json").exists()
+        if full:
+            self._mark_all()
+        dirty = self._connection.execute("SELECT kind, name FROM dirty").fetchall()
+        removed = self._remove_stale_shards(dirty) if full else 0
+        for kind, name in dirty:
+            if kind == "terms":
+                filepath = self._output_dir / "terms" / f"{name}.json"
+                data = self._get_terms_shard(name)
+            else:
+                filepath = self._output_dir / "docs" / f"{name}.json"
+                data = self._get_documents_shard(int(name))
+
+            if data:
+                filepath.parent.mkdir(parents=True, exist_ok=True)
+                write_if_changed(filepath, self._dump(data))
+            else:
+                filepath.unlink(missing_ok=True)
+
+        self._output_dir.mkdir(parents=True, exist_ok=True)
+        meta = {
+            "prefix_length": PREFIX_LENGTH,
+            "documents_per_shard": DOCUMENTS_PER_SHARD,
+            # Dropped from queries by the client since they're never indexed
+            "stop_words": sorted(STOP_WORDS),
+        }
+        write_if_changed(self._output_dir / "meta.json", self._dump(meta))
+        if dirty:
+            with self._connection:
+                self._connection.execute("DELETE FROM dirty")
+        return len(dirty) + removed
+
+    def close(self):
+
+        self._connection.close()
+
+    # ----- HELPER METHODS -----
+    def _update(self, document: SearchDocument) -> bool:
+
+        digest = self._digest(document)
+        row = self._connection.execute(
+            "SELECT id, url, title, digest FROM documents WHERE source = ?",
+            (document.source,),
+        ).fetchone()
+        if row is not None and row[3] == digest:
+            return False
+
+        if row is None:
+            cursor = self._connection.execute(
+                "INSERT INTO documents (source, url, title, digest) VALUES (?, ?, ?, ?)",
+                (document.source, document.url, document.title, digest),
+            )
+            document_id = cursor.lastrowid
+            self._mark_document(document_id)
+        else:
+            document_id = row[0]
+            if (row[1], row[2]) != (document.url, document.title):
+                self._mark_document(document_id)
+            self._connection.execute(
+                "UPDATE documents SET url = ?, title = ?, digest = ? WHERE id = ?",
+                (document.url, document.title, digest, document_id),
+            )
+            self._mark_terms(self._get_terms(document_id))
+            self._connection.execute(
+                "DELETE FROM postings WHERE document = ?", (document_id,)
+            )
+
+        self._connection.executemany(
+            "INSERT INTO postings VALUES (?, ?, ?)",
+            ((term, document_id, weight) for term, weight in document.terms.items()),
+        )
+        self._mark_terms(document.terms)
+        return True
+
+    def _remove(self, document_ids: list[int]):
+
+        with self._connection:
+            for document_id in document_ids:
+                self._mark_document(document_id)
+                self._mark_terms(self._get_terms(document_id))
+                self._connection.execute(
+                    "DELETE FROM documents WHERE id = ?", (document_id,)
+                )
+
+    def _get_terms_shard(self, prefix: str) -> dict[str, list[list[int]]]:
+        """Returns the postings of the terms starting with the prefix, the heaviest
+        first."""
+
+        shard: dict[str, list[list[int]]] = {}
+        for term, document_id, weight in self._connection.execute(
+            "SELECT term, document, weight FROM postings"
+            " WHERE term >= ? AND term < ? ORDER BY term, weight DESC, document",
+            (prefix, prefix + "\U0010ffff"),
+        ):
+            shard.setdefault(term, []).append([document_id, weight])
+        return shard
+
+    def _get_documents_shard(self, number: int) -> dict[str, list[str]]:
+
+        return {
+            str(document_id): [url, title]
+            for document_id, url, title in self._connection.execute(
+                "SELECT id, url, title FROM documents WHERE id >= ? AND id < ?"
+                " ORDER BY id",
+                (number * DOCUMENTS_PER_SHARD, (number + 1) * DOCUMENTS_PER_SHARD),
+            )
+        }
+
+    def _get_terms(self, document_id: int) -> list[str]:
+
+        return [
+            row[0]
+            for row in self._connection.execute(
+                "SELECT term FROM postings WHERE document = ?", (document_id,)
+            )
+        ]
+
+    def _mark_all(self):
+        """Marks every shard to be written again."""
+
+        with self._connection:
+            self._connection.execute(
+                "INSERT OR IGNORE INTO dirty"
+                " SELECT DISTINCT 'terms', substr(term, 1, ?) FROM postings",
+                (PREFIX_LENGTH,),
+            )
+            self._connection.execute(
+                "INSERT OR IGNORE INTO dirty"
+                " SELECT DISTINCT 'docs', CAST(id / ? AS TEXT) FROM documents",
+                (DOCUMENTS_PER_SHARD,),
+            )
+
+    def _remove_stale_shards(self, dirty: list[tuple[str, str]]) -> int:
+        """Removes the files of the output directory that aren't among the given
+        shards. Returns the number of removed files."""
+
+        removed = 0
+        for kind in ("terms", "docs"):
+            names = {name for shard_kind, name in dirty if shard_kind == kind}
+            for filepath in (self._output_dir / kind).glob("*.json"):
+                if filepath.stem not in names:
+                    filepath.unlink()
+                    removed += 1
+        return removed
+
+    def _mark_terms(self, terms):
+        """Marks the shards of the terms to be written again."""
+
+        self._connection.executemany(
+            "INSERT OR IGNORE INTO dirty VALUES ('terms', ?)",
+            ((prefix,) for prefix in {term[:PREFIX_LENGTH] for term in terms}),
+        )
+
+    def _mark_document(self, document_id: int):
+        """Marks the shard of the document to be written again."""
+
+        self._connection.execute(
+            "INSERT OR IGNORE INTO dirty VALUES ('docs', ?)",
+            (str(document_id // DOCUMENTS_PER_SHARD),),
+        )
+
+    def _digest(self, document: SearchDocument) -> str:
+
+        content = json.dumps(
+            [document.url, document.title, document.terms], sort_keys=True
+        )
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _dump(self, data: dict) -> bytes:
+
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+
+
+def extract_terms(metadata: dict[str, str], content: str) -> dict[str, int]:
+    """Returns the weights of the terms of an article, given its metadata and its HTML
+    content. A term weighs as much as its occurrences in the body, plus TITLE_WEIGHT
+    for every occurrence in the title and METADATA_WEIGHT for every occurrence in the
+    other metadata, such as the tags. Dates aren't indexed."""
+
+    text = html.unescape(HTML_TAG.sub(" ", content))
+    weights = Counter(_tokenize(text))
+    for key, value in metadata.items():
+        if key == "date":
+            continue
+        weight = TITLE_WEIGHT if key == "title" else METADATA_WEIGHT
+        for term in _tokenize(value):
+            weights[term] += weight
+    return dict(weights)
+
+
+def _tokenize(text: str) -> list[str]:
+
+    return [
+        token
+        for token in TOKEN.findall(text.lower())
+        if len(token) <= MAX_TERM_LENGTH and token not in STOP_WORDS
+    ]
@@ -0,0 +1,76 @@
+# Standard library imports
+import json
+import hashlib
+from pathlib import Path
+
+# Local imports
+from generator import exceptions
+
+
+# ----- CONSTANTS -----
+
+# Directory within the output directory of a shard holding its partial manifest and
+# metadata index
+SHARD_DIRECTORY = ".shard"
+# File within the shard directory recording which of the shards of a build it holds
+SHARD_FILE = "shard.json"
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """Parses a shard given as 'K/N', the K-th of N shards counting from 1. Returns
+    the index of the shard counting from 0 along with the number of shards. Raises
+    InvalidShard if the spec is malformed."""
+
+    try:
+        number, count = (int(part) for part in spec.split("/"))
+    except ValueError:
+        raise exceptions.InvalidShard(spec)
+    if count < 1 or not 1 <= number <= count:
+        raise exceptions.InvalidShard(spec)
+    return number - 1, count
+
+
+def get_shard(key: str, count: int) -> int:
+    """Returns the index of the shard a source belongs to. The shard only depends on
+    the key of the source (its path relative to the project directory), so every
+    machine assigns the same files to the same shards and files keep their shard as
+    others are added or removed."""
+
+    digest = hashlib.sha256(key.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+def save_shard(output_dir: Path, shard: tuple[int, int]):
+    """Records which shard, given as its index and the number of shards, the output
+    directory holds."""
+
+    index, count = shard
+    shard_dir = output_dir / SHARD_DIRECTORY
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    with open(shard_dir / SHARD_FILE, "w", encoding="utf-8") as f:
+        json.dump({"number": index + 1, "count": count}, f)
+
+
+def check_shards(output_dirs: list[Path]):
+    """Makes sure that the output directories hold every shard of a build exactly
+    once. Raises NotAShard if a directory isn't the output of a shard and
+    IncompleteShards, listing the shards found as 'K/N', if they don't make up a
+    complete set."""
+
+    shards: list[tuple[int, int]] = []
+    for output_dir in output_dirs:
+        try:
+            with open(
+                output_dir / SHARD_DIRECTORY / SHARD_FILE, "r", encoding="utf-8"
+            ) as f:
+                info = json.load(f)
+            shards.append((int(info["number"]), int(info["count"])))
+        except (OSError, ValueError, KeyError, TypeError):
+            raise exceptions.NotAShard(str(output_dir))
+
+    counts = {count for _, count in shards}
+    numbers = sorted(number for number, _ in shards)
+    if len(counts) != 1 or numbers != list(range(1, counts.pop() + 1)):
+        raise exceptions.IncompleteShards(
+            ", ".join(f"{number}/{count}" for number, count in shards)
+        )
@@ -0,0 +1,151 @@
+# Standard library imports
+import os
+import shutil
+import hashlib
+from pathlib import Path
+from typing import Iterable
+
+# Local imports
+from generator.types import SyncStats
+
+
+# ----- CONSTANTS -----
+
+# ioctl request that clones a file on copy-on-write filesystems (btrfs, xfs etc.)
+FICLONE = 0x40049409
+
+
+def sync_directory(
+    source: Path,
+    destination: Path,
+    *,
+    prune: bool = True,
+    exclude: Iterable[str] = (),
+) -> SyncStats:
+    """Makes the destination directory a mirror of the source directory. Only files
+    whose size, modification time or content differ are copied and files that no
+    longer exist in the source are removed from the destination unless pruning is
+    turned off. The gzipped siblings (`<file>.gz`) written next to the synced files
+    are kept until their file changes. Directories of the source with one of the
+    excluded names are skipped."""
+
+    copied = skipped = removed = 0
+    source_files: set[Path] = set()
+    excluded = set(exclude)
+
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames[:] = [name for name in dirnames if name not in excluded]
+        relative_dir = Path(dirpath).relative_to(source)
+        (destination / relative_dir).mkdir(parents=True, exist_ok=True)
+        names = set(filenames)
+        for filename in filenames:
+            relative_fp = relative_dir / filename
+            source_files.add(relative_fp)
+            if _is_in_sync(source / relative_fp, destination / relative_fp):
+                skipped += 1
+                continue
+            _link_or_copy(source / relative_fp, destination / relative_fp)
+            copied += 1
+            # The copied file may be older than the sibling compressed from the
+            # previous version, which would then pass for current
+            if filename + ".gz" not in names:
+                (destination / relative_fp).with_name(filename + ".gz").unlink(
+                    missing_ok=True
+                )
+
+    if not prune:
+        return SyncStats(copied=copied, skipped=skipped, removed=removed)
+
+    # Pruning the files that were deleted from the source. Walking bottom up so that
+    # directories are visited after their contents were removed.
+    for dirpath, _, filenames in os.walk(destination, topdown=False):
+        relative_dir = Path(dirpath).relative_to(destination)
+        for filename in filenames:
+            relative_fp = relative_dir / filename
+            if relative_fp in source_files:
+                continue
+            if filename.endswith(".gz") and relative_fp.with_suffix("") in source_files:
+                continue
+            os.remove(Path(dirpath) / filename)
+            removed += 1
+        if relative_dir != Path(".") and not (source / relative_dir).is_dir():
+            try:
+                os.rmdir(dirpath)
+            except OSError:  # Not empty
+                pass
+
+    return SyncStats(copied=copied, skipped=skipped, removed=removed)
+
+
+def _is_in_sync(source_fp: Path, destination_fp: Path) -> bool:
+    """Checks whether the destination file already holds the same content as the
+    source file. The content is only hashed when the sizes match but the modification
+    times don't."""
+
+    try:
+        destination_stat = destination_fp.stat()
+    except FileNotFoundError:
+        return False
+    source_stat = source_fp.stat()
+
+    # Hard linked
+    if (source_stat.st_dev, source_stat.st_ino) == (
+        destination_stat.st_dev,
+        destination_stat.st_ino,
+    ):
+        return True
+    if source_stat.st_size != destination_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == destination_stat.st_mtime_ns:
+        return True
+    if _hash_file(source_fp) != _hash_file(destination_fp):
+        return False
+
+    # Syncing the modification time so that the next run doesn't hash again
+    shutil.copystat(source_fp, destination_fp)
+    return True
+
+
+def _link_or_copy(source_fp: Path, destination_fp: Path):
+    """Places the source file at the destination. Reflinks are preferred since they
+    are copy-on-write, then hard links, and the file is copied only when the
+    filesystem supports neither."""
+
+    destination_fp.unlink(missing_ok=True)
+    if _reflink(source_fp, destination_fp):
+        return
+    try:
+        os.link(source_fp, destination_fp)
+        return
+    except OSError:
+        pass
+    shutil.copy2(source_fp, destination_fp)
+
+
+def _reflink(source_fp: Path, destination_fp: Path) -> bool:
+    """Tries to clone the source file to the destination. Returns whether it worked."""
+
+    try:
+        import fcntl
+    except ImportError:  # Not available on Windows
+        return False
+
+    try:
+        with open(source_fp, "rb") as src, open(destination_fp, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        destination_fp.unlink(missing_ok=True)
+        return False
+
+    shutil.copystat(source_fp, destination_fp)
+    return True
+
+
+def _hash_file(filepath: Path) -> str:
+    """Returns the hex digest of the file contents."""
+
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
@@ -0,0 +1,24 @@
+# Standard library imports
+from pathlib import Path
+
+# Local imports
+from generator import exceptions
+
+
+def parse_targets(specs: list[str]) -> list[tuple[str, Path]]:
+    """Parses build targets given as 'theme:publish_dir'. Returns the theme and the
+    absolute publish directory of every target. Raises InvalidTarget if a spec is
+    malformed or two targets share a publish directory."""
+
+    targets: list[tuple[str, Path]] = []
+    for spec in specs:
+        theme, separator, directory = spec.partition(":")
+        if not separator or not theme or not directory:
+            raise exceptions.InvalidTarget(spec)
+        targets.append((theme, Path(directory).absolute()))
+
+    publish_dirs = [publish_dir for _, publish_dir in targets]
+    for spec, publish_dir in zip(specs, publish_dirs):
+        if publish_dirs.count(publish_dir) > 1:
+            raise exceptions.InvalidTarget(spec)
+    return targets
@@ -4,18 +4,28 @@ from typing import Optional
 
 # External library imports
 import typer
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import (
+    ChoiceLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    pass_context,
+)
+from jinja2.runtime import Context
 
 
 # Local imports
-from generator.types import ParsedFileData
+from generator.assets import AssetPipeline
+from generator.types import ListingPage, ParsedFileData
 from helpers import get_config
 
 
 # ----- CONSTANTS -----
 
+# Directory within a theme whose templates take precedence over the ones of the project
+THEME_TEMPLATES_DIR = "templates"
+
 
-# TODO: Find out a better way of handling this so that I'm not doing so many file reads.
 def get_templates_dir() -> Path:
     try:
         config = get_config()
@@ -26,17 +36,78 @@ def get_templates_dir() -> Path:
         return Path(".") / "templates"
 
 
-class Templater:
-    """Base class that handles the templating using Jinja2."""
+class _LazyEnvironment:
+    """Creates the Jinja environment the first time it's accessed, so that importing
+    the templaters doesn't read the configuration."""
+
+    def __init__(self):
+
+        self._env: Optional[Environment] = None
+
+    def __get__(self, instance, owner) -> Environment:
+
+        if self._env is None:
+            self._env = Environment(
+                loader=FileSystemLoader(get_templates_dir()), autoescape=False
+            )
+        return self._env
+
 
-    JINJA_ENV = Environment(
-        loader=FileSystemLoader(get_templates_dir()), autoescape=False
+def create_environment(theme_dir: Path) -> Environment:
+    """Creates a Jinja environment for the theme. Templates in the `templates`
+    directory of the theme override the templates of the project with the same name,
+    so that themes can change the markup as well as the styles."""
+
+    loader = ChoiceLoader(
+        [
+            FileSystemLoader(theme_dir / THEME_TEMPLATES_DIR),
+            FileSystemLoader(get_templates_dir()),
+        ]
     )
+    return Environment(loader=loader, autoescape=False)
+
+
+class Templater:
+    """Base class that handles the templating using Jinja2. Templaters render with
+    the shared environment of the project templates unless they're given one, e.g.
+    the environment of a theme."""
+
+    JINJA_ENV = _LazyEnvironment()
+
+    def __init__(self, env: Optional[Environment] = None):
+
+        self._env: Environment = env if env is not None else Templater.JINJA_ENV
+
+    @staticmethod
+    def enable_bytecode_cache(directory: Path, env: Optional[Environment] = None):
+        """Persists the compiled templates in the directory so that later runs don't
+        have to compile them again. Jinja stores the checksum of the template source
+        along with the bytecode, so edited templates are recompiled."""
+
+        directory.mkdir(parents=True, exist_ok=True)
+        env = env if env is not None else Templater.JINJA_ENV
+        env.bytecode_cache = FileSystemBytecodeCache(str(directory))
 
     @staticmethod
-    def get_templates_list() -> list[str]:
+    def enable_assets(assets: AssetPipeline, env: Optional[Environment] = None):
+        """Adds the `asset()` helper that templates use to link to the assets of the
+        theme, e.g. `{{ asset("css/index.css", "css/article.css") }}` bundles both
+        stylesheets. The URL is relative to the page, using the `root` variable of
+        pages that aren't saved at the root of the publish directory."""
+
+        @pass_context
+        def asset(context: Context, *sources: str) -> str:
+
+            return f"{context.get('root', '')}assets/{assets.publish(*sources)}"
+
+        env = env if env is not None else Templater.JINJA_ENV
+        env.globals["asset"] = asset
+
+    @staticmethod
+    def get_templates_list(env: Optional[Environment] = None) -> list[str]:
         """Returns a list of the templates"""
-        return Templater.JINJA_ENV.list_templates()
+        env = env if env is not None else Templater.JINJA_ENV
+        return env.list_templates()
 
     def render(self, filedata: ParsedFileData) -> str:
         raise NotImplementedError("to be implemented by subclass")
@@ -52,7 +123,7 @@ class ArticleTemplater(Templater):
     def render(self, filedata: ParsedFileData) -> str:
 
         jinja_variables = self._create_jinja_variables(filedata)
-        article_template = Templater.JINJA_ENV.get_template("article_template.html")
+        article_template = self._env.get_template("article_template.html")
         return article_template.render(jinja_variables)
 
 
@@ -61,5 +132,23 @@ class PageTemplater(Templater):
     def render(self, filedata: ParsedFileData, *, template: str) -> str:  # type: ignore
 
         jinja_variables = self._create_jinja_variables(filedata)
-        page_template = Templater.JINJA_ENV.get_template(template)
+        page_template = self._env.get_template(template)
         return page_template.render(jinja_variables)
+
+
+class ListingTemplater(Templater):
+    TEMPLATE: str = "listing_template.html"
+
+    def render(self, listing: ListingPage) -> str:  # type: ignore
+
+        articles = [
+            {**article._asdict(), "url": listing.root + article.output}
+            for article in listing.articles
+        ]
+        jinja_variables = {
+            **listing._asdict(),
+            "articles": articles,
+            "links": [link._asdict() for link in listing.links],
+        }
+        listing_template = self._env.get_template(ListingTemplater.TEMPLATE)
+        return listing_template.render(jinja_variables)
@@ -1,4 +1,4 @@
-from typing import TypedDict, NamedTuple
+from typing import Optional, TypedDict, NamedTuple
 from pathlib import Path
 
 
@@ -21,3 +21,134 @@ class FileDetails(NamedTuple):
 
     filename: str
     filepath: Path
+
+
+class ManifestEntry(TypedDict):
+    """Type that represents the inputs and output recorded for a source file in the
+    build manifest. `templates` holds the digests of the template and every template
+    it extends, includes or imports, and `assets` the digest of the theme files if the
+    templates link to assets. `minified` tells whether the output was minified."""
+
+    content_hash: str
+    metadata_hash: str
+    template: str
+    templates: dict[str, str]
+    assets: str
+    minified: bool
+    output: str
+
+
+class CachedDirectory(TypedDict):
+    """Type that represents the listing of a directory cached by the content
+    discovery, along with the modification time of the directory when it was listed."""
+
+    mtime_ns: int
+    files: list[str]
+    directories: list[str]
+
+
+class FailedFile(NamedTuple):
+    """Type that represents a file that couldn't be processed and the exception that
+    was raised for it."""
+
+    filepath: Path
+    error: type[Exception]
+
+
+class ProfileEvent(NamedTuple):
+    """Type that represents the time spent in a stage of the build."""
+
+    stage: str
+    filepath: str
+    start_ns: int
+    duration_ns: int
+    pid: int
+
+
+class WorkerResult(NamedTuple):
+    """Type that represents the outcome of generating a file in a worker process."""
+
+    error: Optional[type[Exception]]
+    entry: Optional[ManifestEntry]
+    skipped: bool
+    events: list[ProfileEvent]
+    search_document: Optional["SearchDocument"]
+    # The manifest entries of the file for the additional targets of the build, or
+    # None for the targets whose output was up to date
+    target_entries: list[Optional[ManifestEntry]]
+
+
+class SyncStats(NamedTuple):
+    """Type that represents the namedtuple that holds the outcome of syncing a
+    directory."""
+
+    copied: int
+    skipped: int
+    removed: int
+
+
+class CompressStats(NamedTuple):
+    """Type that represents the namedtuple that holds the outcome of precompressing a
+    directory."""
+
+    compressed: int
+    skipped: int
+    removed: int
+
+
+class IndexEntry(NamedTuple):
+    """Type that represents the metadata of an article stored in the metadata index."""
+
+    source: str
+    output: str
+    title: str
+    date: str
+    author: str
+    tags: list[str]
+    metadata: dict[str, str]
+
+
+class ListingLink(NamedTuple):
+    """Type that represents a link to another listing, e.g. the page of a tag."""
+
+    title: str
+    url: str
+    count: int
+
+
+class ListingPage(NamedTuple):
+    """Type that represents a generated listing page. `output` is relative to the
+    publish directory and `root` is the relative URL of the publish directory as seen
+    from the page. `newer` and `older` are the relative URLs of the neighbouring pages
+    of the listing, if any."""
+
+    output: str
+    title: str
+    root: str
+    page: int
+    articles: list[IndexEntry]
+    links: list[ListingLink]
+    newer: Optional[str]
+    older: Optional[str]
+
+
+class SearchDocument(NamedTuple):
+    """Type that represents an article as seen by the search index. `source` is the
+    key of the article in the manifest, `url` is relative to the publish directory and
+    `terms` maps the terms of the article to their weights."""
+
+    source: str
+    url: str
+    title: str
+    terms: dict[str, int]
+
+
+class BrokenReference(NamedTuple):
+    """Type that represents a reference of an HTML file to a file that doesn't exist.
+    `source` is the HTML file relative to the checked directory and `kind` is either
+    "link" for links to other pages or "asset" for stylesheets, scripts, images etc."""
+
+    source: str
+    line: int
+    reference: str
+    kind: str
@@ -1,10 +1,28 @@
 import json
 from pathlib import Path
+from functools import cache
 
+from generator.exceptions import InvalidConfig
 
+
+@cache
 def get_config() -> dict[str, str]:
+    """Returns the project configuration stored in 'config.json' in the current
+    directory. The file is only read and validated once per process. Raises the
+    FileNotFoundError if the file doesn't exist."""
 
     root_dir = Path(".")
     config_fp = root_dir / "config.json"
     with open(config_fp, "r") as f:
-        return json.load(f)
+        try:
+            config = json.load(f)
+        except json.JSONDecodeError as e:
+            raise InvalidConfig(f"'config.json' is not valid JSON: {e}")
+
+    if not isinstance(config, dict):
+        raise InvalidConfig("'config.json' must hold a JSON object")
+    for key, value in config.items():
+        if not isinstance(value, str):
+            raise InvalidConfig(f"'{key}' in 'config.json' must be a string")
+
+    return config
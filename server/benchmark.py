@@ -0,0 +1,144 @@
+"""Load test for the static server.
+
+Starts the server on the given directory in a separate process and hammers it with
+concurrent keep-alive clients, then reports the requests per second and latency
+percentiles. Run it from the root of the repository:
+
+    python -m server.benchmark publish --clients 32 --duration 10
+"""
+
+# Standard library imports
+import sys
+import time
+import random
+import argparse
+import http.client
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+
+
+def run_client(
+    host: str, port: int, paths: list[str], duration: float, headers: dict[str, str]
+) -> tuple[list[float], int]:
+    """Requests random paths over a single keep-alive connection until the duration
+    runs out. Returns the latencies in seconds and the number of failed requests."""
+
+    latencies: list[float] = []
+    errors = 0
+    connection = http.client.HTTPConnection(host, port, timeout=10)
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        path = random.choice(paths)
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+        if response.status >= 400:
+            errors += 1
+
+    connection.close()
+    return latencies, errors
+
+
+def get_paths(directory: Path) -> list[str]:
+    """Returns the URL paths of every file in the directory."""
+
+    return [
+        "/" + path.relative_to(directory).as_posix()
+        for path in directory.rglob("*")
+        if path.is_file() and path.suffix != ".gz"
+    ]
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Returns the value below which the given fraction of the sorted values lie."""
+
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+
+def wait_for_server(host: str, port: int, timeout: float = 10):
+    """Blocks until the server accepts connections."""
+
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request("HEAD", "/")
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def main():
+
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("directory", type=Path, help="directory to serve")
+    arg_parser.add_argument("--port", type=int, default=8765)
+    arg_parser.add_argument("--clients", type=int, default=16)
+    arg_parser.add_argument("--duration", type=float, default=5.0)
+    arg_parser.add_argument(
+        "--gzip", action="store_true", help="send 'Accept-Encoding: gzip'"
+    )
+    args = arg_parser.parse_args()
+
+    paths = get_paths(args.directory)
+    if not paths:
+        sys.exit(f"no files found in '{args.directory}'")
+
+    server_script = Path(__file__).with_name("server.py")
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            str(server_script),
+            str(args.directory),
+            "--port",
+            str(args.port),
+        ],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_server("127.0.0.1", args.port)
+        headers = {"Accept-Encoding": "gzip"} if args.gzip else {}
+        with ProcessPoolExecutor(max_workers=args.clients) as executor:
+            futures = [
+                executor.submit(
+                    run_client, "127.0.0.1", args.port, paths, args.duration, headers
+                )
+                for _ in range(args.clients)
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        sys.exit("no requests completed")
+
+    print(f"files:        {len(paths)}")
+    print(f"clients:      {args.clients}")
+    print(f"requests:     {len(latencies)} ({errors} errors)")
+    print(f"requests/sec: {len(latencies) / args.duration:.1f}")
+    print(f"p50 latency:  {percentile(latencies, 0.50) * 1000:.2f} ms")
+    print(f"p99 latency:  {percentile(latencies, 0.99) * 1000:.2f} ms")
+    print(f"max latency:  {latencies[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+
+    main()
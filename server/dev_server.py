@@ -0,0 +1,403 @@
+# Standard library imports
+import os
+import time
+import threading
+from pathlib import Path
+from http import HTTPStatus
+from typing import Optional
+from functools import cached_property
+from http.server import ThreadingHTTPServer
+
+# External library imports
+import typer
+from jinja2 import TemplateError
+
+# Local imports
+from generator import exceptions
+from generator.generator import Generator
+from generator.index import MetadataIndex
+from generator.listings import Listings
+from generator.templater import THEME_TEMPLATES_DIR
+from server.server import CustomServer
+
+
+# ----- CONSTANTS -----
+
+POLL_INTERVAL = 0.05
+RELOAD_PATH = "/__reload"
+RELOAD_SCRIPT = f"""<script>
+new EventSource("{RELOAD_PATH}").onmessage = () => location.reload();
+</script>
+"""
+
+
+class Watcher:
+    """Detects changed files in a set of directories by polling their modification
+    times, so it works everywhere without any external services."""
+
+    def __init__(self, directories: list[Path]):
+
+        self._directories: list[Path] = directories
+        self._snapshot: dict[str, tuple[int, int]] = self._scan()
+
+    def poll(self) -> tuple[list[Path], list[Path]]:
+        """Returns the files that were added or modified and the files that were
+        removed since the last poll."""
+
+        snapshot = self._scan()
+        changed = [
+            Path(path)
+            for path, signature in snapshot.items()
+            if self._snapshot.get(path) != signature
+        ]
+        removed = [Path(path) for path in self._snapshot if path not in snapshot]
+        self._snapshot = snapshot
+        return changed, removed
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        """Returns the modification time and size of every file in the directories."""
+
+        snapshot: dict[str, tuple[int, int]] = {}
+        pending = [str(directory) for directory in self._directories]
+        while pending:
+            try:
+                entries = list(os.scandir(pending.pop()))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                snapshot[entry.path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+
+class InMemoryGenerator(Generator):
+    """Generator that keeps the rendered HTML in memory instead of saving it to the
+    publish directory. The build manifest and the state of the listings are never
+    saved since the outputs they would describe aren't on disk. Outputs count as up
+    to date only once they're in memory, so the first build renders every file."""
+
+    def __init__(self, theme: Optional[str] = None):
+
+        super().__init__(theme)
+        self.pages: dict[str, bytes] = {}
+        # The search index describes the published site, not the one in memory
+        self._search_enabled = False
+
+    @cached_property
+    def index(self) -> MetadataIndex:
+        """The index of the metadata of the articles, kept in memory so that the
+        listings follow the edited content without touching the index of the
+        published site."""
+
+        return MetadataIndex(Path(":memory:"), self._project_dir)
+
+    @cached_property
+    def listings(self) -> Listings:
+        """The listings of the articles, along with the digests of the pages kept in
+        memory across updates."""
+
+        return Listings(self.index, None, self._get_page_size())
+
+    @property
+    def publish_dir(self) -> Path:
+
+        return self._publish_dir
+
+    @property
+    def watched_dirs(self) -> list[Path]:
+        """Returns the directories whose changes trigger a rebuild."""
+
+        return [self._content_dir, self._project_dir / "templates"]
+
+    def build(self):
+        """Renders every article, page and listing page and syncs the theme."""
+
+        self._set_theme()
+        md_files = list(self.discovery.walk(self._content_dir))
+        for filepath in md_files:
+            self.generate(filepath)
+        self.discovery.save()
+
+        articles_dir = self._content_dir / "articles"
+        changed = self._sync_index(
+            [filepath for filepath in md_files if articles_dir in filepath.parents],
+            articles_dir,
+        )
+        self.render_listings(changed)
+
+    def update(self, changed: list[Path], removed: list[Path]) -> int:
+        """Re-renders the changed files and everything that depends on them. Returns
+        the number of rendered files."""
+
+        to_render: set[Path] = set()
+        changed_articles: set[str] = set()
+        for filepath in changed + removed:
+            if filepath.suffix == ".md" and self._is_content(filepath):
+                if filepath.exists():
+                    to_render.add(filepath)
+                else:
+                    self._forget(filepath)
+                if (self._content_dir / "articles") in filepath.parents:
+                    changed_articles |= self._sync_index(
+                        [filepath] if filepath.exists() else [], filepath
+                    )
+            elif filepath.suffix == ".html" and self._is_theme_template(filepath):
+                to_render.update(self._get_dependents(filepath))
+            elif self._is_theme_file(filepath):
+                self._theme_synced = False
+                self._set_theme()
+                self._assets.clear()
+                to_render.update(self._get_asset_dependents())
+            elif filepath.suffix == ".html":
+                to_render.update(self._get_dependents(filepath))
+
+        for filepath in to_render:
+            self.generate(filepath)
+        # Only the listings holding changed articles are looked at, and none at all
+        # when neither the articles nor the templates of the listings changed
+        return len(to_render) + self.render_listings(changed_articles)
+
+    def render_listings(self, changed: set[str]) -> int:
+        """Renders the listing pages whose contents changed, given the keys of the
+        articles whose index entries changed, and drops the pages of listings that
+        are gone. Returns the number of rendered pages."""
+
+        try:
+            return self._generate_listings(changed)
+        except TemplateError as e:
+            typer.secho(f"\nCouldn't render the listings: {e}", fg="red")
+            return 0
+        except exceptions.AssetNotFound as e:
+            typer.secho(f"\nCouldn't find the asset '{e}' for the listings", fg="red")
+            return 0
+
+    def generate(self, filepath: Path):
+        """Renders the article or page, reporting errors instead of raising them."""
+
+        is_page = (self._content_dir / "pages") in filepath.parents
+        try:
+            if is_page:
+                self.generate_single_page(filepath)
+            else:
+                self.generate_single_article(filepath)
+        except exceptions.NoMetadata:
+            typer.secho(f"\nMissing metadata in {filepath}", fg="magenta")
+        except exceptions.InvalidMetadataSyntax:
+            typer.secho(f"\nInvalid metadata syntax in {filepath}", fg="magenta")
+        except TemplateError as e:
+            typer.secho(f"\nCouldn't render {filepath}: {e}", fg="red")
+        except exceptions.AssetNotFound as e:
+            typer.secho(f"\nCouldn't find the asset '{e}' for {filepath}", fg="red")
+
+    def _get_dependents(self, template_fp: Path) -> set[Path]:
+        """Returns the sources rendered with the template, directly or through
+        another template."""
+
+        self._template_dependencies.clear()
+        # Templates of the theme take precedence over the ones of the project
+        _, theme_dir = self._get_theme_directory()
+        for templates_dir in (
+            theme_dir / THEME_TEMPLATES_DIR,
+            self._project_dir / "templates",
+        ):
+            try:
+                template = template_fp.relative_to(templates_dir).as_posix()
+                break
+            except ValueError:
+                continue
+        else:
+            return set()
+        dependents = {
+            self._project_dir / source
+            for source in self._manifest.sources_using(template)
+        }
+        # The manifest loaded from disk may still list deleted sources
+        return {filepath for filepath in dependents if filepath.exists()}
+
+    def _get_asset_dependents(self) -> set[Path]:
+        """Returns the sources rendered with templates that link to assets, since the
+        fingerprinted names of the assets change along with the theme."""
+
+        dependents = {
+            self._project_dir / source
+            for source in self._manifest.sources_with_assets()
+        }
+        return {filepath for filepath in dependents if filepath.exists()}
+
+    def _forget(self, filepath: Path):
+        """Drops the output of a deleted source."""
+
+        entry = self._manifest.get(filepath)
+        if entry:
+            self._manifest.remove(self._manifest.key(filepath))
+            self.pages.pop(entry["output"], None)
+
+    def _is_content(self, filepath: Path) -> bool:
+
+        return self._content_dir in filepath.parents
+
+    def _is_theme_template(self, filepath: Path) -> bool:
+
+        _, theme_dir = self._get_theme_directory()
+        return (theme_dir / THEME_TEMPLATES_DIR) in filepath.parents
+
+    def _is_theme_file(self, filepath: Path) -> bool:
+
+        return (self._project_dir / "templates" / "themes") in filepath.parents
+
+    def _save_rendered_html(self, filepath: Path, content: str) -> None:
+
+        self._keep_page(self._get_output_path(filepath).name, content)
+
+    def _save_listing_html(self, output: str, content: str):
+
+        self._keep_page(output, content)
+
+    def _has_output(self, output: str) -> bool:
+
+        return output in self.pages
+
+    def _remove_output(self, output: str):
+
+        self.pages.pop(output, None)
+
+    def _keep_page(self, output: str, content: str):
+        """Keeps the rendered HTML in memory with the live reload script added."""
+
+        content = content.replace("</body>", RELOAD_SCRIPT + "</body>", 1)
+        self.pages[output] = content.encode("utf-8")
+
+
+class ReloadNotifier:
+    """Lets the request handlers wait for the next rebuild."""
+
+    def __init__(self):
+
+        self.version: int = 0
+        self._condition: threading.Condition = threading.Condition()
+
+    def notify(self):
+        """Wakes up every waiting handler."""
+
+        with self._condition:
+            self.version += 1
+            self._condition.notify_all()
+
+    def wait(self, version: int, timeout: float) -> int:
+        """Blocks until a rebuild after the given version or the timeout. Returns the
+        current version."""
+
+        with self._condition:
+            self._condition.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+
+class DevServer(CustomServer):
+    """Serves the pages rendered in memory along with the static files on disk, and
+    pushes reload events to the open browsers."""
+
+    generator: InMemoryGenerator
+    notifier: ReloadNotifier
+
+    def do_GET(self):
+
+        if self.path == RELOAD_PATH:
+            self._stream_reloads()
+            return
+
+        content = self._get_page()
+        if content is None:
+            super().do_GET()
+            return
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(content)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        # The dev server prints rebuilds instead of every request
+        pass
+
+    def _get_page(self) -> Optional[bytes]:
+        """Returns the rendered page for the requested path, if any."""
+
+        path = self._translate_path(self.path)
+        if path is None:
+            return None
+        name = os.path.relpath(path, self.directory)
+        return self.generator.pages.get(name)
+
+    def _stream_reloads(self):
+        """Sends a server-sent event to the browser after every rebuild."""
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        # The stream is never closed by this side
+        self.close_connection = True
+
+        version = self.notifier.version
+        try:
+            while True:
+                current = self.notifier.wait(version, timeout=15)
+                message = b"data: reload\n\n" if current != version else b": ping\n\n"
+                self.wfile.write(message)
+                version = current
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def serve(host: str, port: int, theme: Optional[str] = None):
+    """Builds the site in memory, serves it and rebuilds changed files until
+    interrupted. The theme set up in the project configuration is used unless one is
+    given."""
+
+    generator = InMemoryGenerator(theme)
+    start_time = time.time()
+    generator.build()
+    typer.secho(
+        f"\nRendered {len(generator.pages)} files in {time.time() - start_time:.3f} seconds."
+    )
+
+    notifier = ReloadNotifier()
+    handler = type(
+        "Handler",
+        (DevServer,),
+        {
+            "directory": str(generator.publish_dir),
+            "generator": generator,
+            "notifier": notifier,
+        },
+    )
+    web_server = ThreadingHTTPServer((host, port), handler)
+    web_server.daemon_threads = True
+    threading.Thread(target=web_server.serve_forever, daemon=True).start()
+    typer.secho(f"Serving on http://{host or 'localhost'}:{port}", fg="green")
+
+    watcher = Watcher(generator.watched_dirs)
+    try:
+        while True:
+            time.sleep(POLL_INTERVAL)
+            changed, removed = watcher.poll()
+            if not changed and not removed:
+                continue
+            start_time = time.time()
+            rendered = generator.update(changed, removed)
+            notifier.notify()
+            typer.secho(
+                f"Rebuilt {rendered} files in {(time.time() - start_time) * 1000:.1f} ms."
+            )
+    except KeyboardInterrupt:
+        web_server.shutdown()
+        web_server.server_close()
+        typer.secho("\nServer stopped.")
@@ -1,31 +1,369 @@
-from http.server import BaseHTTPRequestHandler, HTTPServer, SimpleHTTPRequestHandler
-import socketserver
+# Standard library imports
+import os
+import sys
+import stat as stat_module
+import argparse
+import mimetypes
+import posixpath
+import threading
+import email.utils
+import urllib.parse
+from pathlib import Path
+from http import HTTPStatus
+from typing import NamedTuple, Optional
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 PORT = 8080
-handler = SimpleHTTPRequestHandler
+
+# Files up to this size are kept in memory once they've been requested
+MAX_CACHED_FILE_SIZE = 64 * 1024
+MAX_CACHE_SIZE = 64 * 1024 * 1024
+
+# Assets published under content-hash names never change, so clients may cache them
+# for good
+IMMUTABLE_DIRECTORY = "assets"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".json", ".xml", ".svg", ".txt")
+
+
+class ResolvedFile(NamedTuple):
+    """Type that represents the file on disk that a request resolved to."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    encoding: Optional[str]
+
+
+class FileCache:
+    """Thread safe in-memory LRU cache of small files. Entries are stored along with
+    the modification time and size of the file so that stale entries are never
+    served."""
+
+    def __init__(self, max_size: int = MAX_CACHE_SIZE):
+
+        self._max_size: int = max_size
+        self._size: int = 0
+        self._entries: OrderedDict[str, tuple[int, int, bytes]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get(self, file: ResolvedFile) -> Optional[bytes]:
+        """Returns the contents of the file if the cached copy is still current."""
+
+        with self._lock:
+            entry = self._entries.get(file.path)
+            if entry is None or entry[:2] != (file.mtime_ns, file.size):
+                return None
+            self._entries.move_to_end(file.path)
+            return entry[2]
+
+    def set(self, file: ResolvedFile, content: bytes):
+        """Stores the contents of the file, evicting the least recently used files
+        when the cache is full."""
+
+        with self._lock:
+            previous = self._entries.pop(file.path, None)
+            if previous:
+                self._size -= len(previous[2])
+            self._entries[file.path] = (file.mtime_ns, file.size, content)
+            self._size += len(content)
+            while self._size > self._max_size:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
 
 
 class CustomServer(BaseHTTPRequestHandler):
+    """Serves the files of a directory with support for conditional and range
+    requests, precompressed files and persistent connections."""
+
+    # Enables keep-alive connections
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which would otherwise stall every
+    # keep-alive response on the delayed ACK of the client
+    disable_nagle_algorithm = True
 
-    SUPPORTED_EXTENSIONS = (".css", ".html")
+    directory: str = "publish"
+    file_cache: FileCache = FileCache()
 
     def do_GET(self):
 
-        # Find file type being requested
-        file_type = self.get_file_type()
-        if file_type not in self.SUPPORTED_EXTENSIONS:
-            self.send_response(404, "Not Found")
+        self._serve(send_body=True)
+
+    def do_HEAD(self):
+
+        self._serve(send_body=False)
+
+    def get_file_type(self, path: str) -> str:
+        """Returns the content type of the file."""
+
+        content_type, _ = mimetypes.guess_type(path)
+        if content_type is None:
+            return "application/octet-stream"
+        if content_type.startswith("text/") or content_type in (
+            "application/javascript",
+            "application/json",
+        ):
+            return content_type + "; charset=utf-8"
+        return content_type
+
+    # ----- HELPER METHODS -----
+    def _serve(self, *, send_body: bool):
+        """Responds with the requested file."""
+
+        path = self._translate_path(self.path)
+        if path and os.path.isdir(path):
+            self._redirect_to_directory()
+            return
+        file = self._resolve_file(path) if path else None
+        if file is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return
+
+        etag = self._get_etag(file)
+        if self._is_not_modified(file, etag):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self._send_validators(file, etag)
+            self.end_headers()
+            return
+
+        byte_range = self._get_byte_range(file, etag)
+        if byte_range == ():
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{file.size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if byte_range:
+            start, end = byte_range
+            self.send_response(HTTPStatus.PARTIAL_CONTENT)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{file.size}")
+        else:
+            start, end = 0, file.size - 1
+            self.send_response(HTTPStatus.OK)
+        length = end - start + 1
+
+        self.send_header("Content-Type", self.get_file_type(path))
+        self.send_header("Content-Length", str(length))
+        self.send_header("Accept-Ranges", "bytes")
+        if file.encoding:
+            self.send_header("Content-Encoding", file.encoding)
+        if path.endswith(COMPRESSIBLE_EXTENSIONS):
+            self.send_header("Vary", "Accept-Encoding")
+        if self._is_immutable(path):
+            self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL)
+        self._send_validators(file, etag)
+        self.end_headers()
+
+        if send_body and length > 0:
+            self._send_file(file, start, length)
+
+    def _translate_path(self, url_path: str) -> Optional[str]:
+        """Translates the URL path to a path within the served directory. Directories
+        requested without a trailing slash are returned as they are, so that the
+        client can be redirected. Returns None if the path would escape the served
+        directory."""
+
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(url_path).path)
+        normalized = posixpath.normpath(url_path)
+        parts = [part for part in normalized.split("/") if part]
+        if any(part in (os.curdir, os.pardir) or os.sep in part for part in parts):
+            return None
+
+        path = os.path.join(self.directory, *parts)
+        if url_path.endswith("/"):
+            path = os.path.join(path, "index.html")
+        elif os.path.isdir(path):
+            return path
+        elif not os.path.splitext(path)[1] and os.path.isfile(path + ".html"):
+            path += ".html"
+        return path
+
+    def _redirect_to_directory(self):
+        """Redirects the client to the URL of the directory with a trailing slash, so
+        that relative links within its index resolve against the directory, like
+        SimpleHTTPRequestHandler does."""
+
+        parts = urllib.parse.urlsplit(self.path)
+        location = urllib.parse.urlunsplit(
+            (parts.scheme, parts.netloc, parts.path + "/", parts.query, parts.fragment)
+        )
+        self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+        self.send_header("Location", location)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _resolve_file(self, path: str) -> Optional[ResolvedFile]:
+        """Finds the file to serve for the path. The precompressed `.gz` sibling is
+        preferred when the client accepts gzip and it's at least as new as the file.
+        Range requests are always served from the uncompressed file."""
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if not stat_module.S_ISREG(stat.st_mode):
+            return None
+
+        if self._accepts_gzip() and "Range" not in self.headers:
+            try:
+                gzip_stat = os.stat(path + ".gz")
+            except OSError:
+                pass
+            else:
+                if gzip_stat.st_mtime_ns >= stat.st_mtime_ns:
+                    return ResolvedFile(
+                        path + ".gz", gzip_stat.st_size, gzip_stat.st_mtime_ns, "gzip"
+                    )
+
+        return ResolvedFile(path, stat.st_size, stat.st_mtime_ns, None)
+
+    def _accepts_gzip(self) -> bool:
+        """Checks whether the Accept-Encoding header of the request allows gzip. A
+        quality value of 0 refuses the coding, and an explicit 'gzip' takes precedence
+        over '*'."""
+
+        qualities: dict[str, float] = {}
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, *params = coding.split(";")
+            quality = 1.0
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            qualities[name.strip().lower()] = quality
+
+        quality = qualities.get("gzip", qualities.get("*", 0.0))
+        return quality > 0
+
+    def _is_immutable(self, path: str) -> bool:
+        """Checks whether the file is a fingerprinted asset."""
+
+        relative_path = os.path.relpath(path, self.directory)
+        return relative_path.startswith(IMMUTABLE_DIRECTORY + os.sep)
+
+    def _get_etag(self, file: ResolvedFile) -> str:
+        """Returns the entity tag of the file, derived from its size and modification
+        time."""
+
+        suffix = f"-{file.encoding}" if file.encoding else ""
+        return f'"{file.mtime_ns:x}-{file.size:x}{suffix}"'
+
+    def _send_validators(self, file: ResolvedFile, etag: str):
+        """Sends the headers the client uses to revalidate its cached copy."""
+
+        self.send_header("ETag", etag)
+        self.send_header(
+            "Last-Modified", email.utils.formatdate(file.mtime_ns / 1e9, usegmt=True)
+        )
+
+    def _is_not_modified(self, file: ResolvedFile, etag: str) -> bool:
+        """Checks whether the client's cached copy is still current."""
+
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return int(file.mtime_ns / 1e9) <= since.timestamp()
+
+    def _get_byte_range(self, file: ResolvedFile, etag: str) -> Optional[tuple]:
+        """Returns the requested (start, end) byte range, None when the whole file
+        should be sent and an empty tuple when the range can't be satisfied. Only
+        single ranges are supported, other range requests get the whole file."""
+
+        range_header = self.headers.get("Range")
+        if not range_header or not range_header.startswith("bytes="):
+            return None
+        if_range = self.headers.get("If-Range")
+        if if_range is not None and if_range.strip() != etag:
+            return None
+
+        spec = range_header[len("bytes=") :].strip()
+        if "," in spec or "-" not in spec:
+            return None
+        first, last = (value.strip() for value in spec.split("-", 1))
+        try:
+            if not first:  # Suffix range, e.g. the last 500 bytes
+                suffix_length = int(last)
+                if suffix_length <= 0:
+                    return ()
+                return max(0, file.size - suffix_length), file.size - 1
+            start = int(first)
+            end = int(last) if last else file.size - 1
+        except ValueError:
+            return None
+
+        if start >= file.size or end < start:
+            return ()
+        return start, min(end, file.size - 1)
+
+    def _send_file(self, file: ResolvedFile, start: int, length: int):
+        """Writes the requested part of the file to the client. Small files are
+        served from the in-memory cache and everything else is handed to the kernel
+        with sendfile so the contents are never copied through Python."""
+
+        if file.size <= MAX_CACHED_FILE_SIZE:
+            content = self.file_cache.get(file)
+            if content is None:
+                with open(file.path, "rb") as f:
+                    content = f.read()
+                self.file_cache.set(file, content)
+            self.wfile.write(content[start : start + length])
             return
-        
 
-    def get_file_type(self):
-        pass
+        with open(file.path, "rb") as f:
+            # Falls back to regular reads and writes where sendfile isn't available
+            self.connection.sendfile(f, start, length)
+
+
+def create_server(
+    directory: str | Path, host: str = "", port: int = PORT
+) -> ThreadingHTTPServer:
+    """Creates a threaded server for the directory."""
+
+    handler = type("Handler", (CustomServer,), {"directory": str(directory)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def _get_publish_directory() -> Path:
+    """Returns the publish directory of the project in the current directory."""
+
+    # Imported here since the helpers live at the root of the repository
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from helpers import get_config
+
+    try:
+        return Path(get_config()["project_directory"]) / "publish"
+    except (FileNotFoundError, KeyError):
+        return Path(".") / "publish"
 
 
 if __name__ == "__main__":
-    webServer = HTTPServer(("", PORT), CustomServer)
-    print("server started")
+    arg_parser = argparse.ArgumentParser(description="Serves the publish directory.")
+    arg_parser.add_argument("directory", nargs="?", help="directory to serve")
+    arg_parser.add_argument("--host", default="")
+    arg_parser.add_argument("--port", type=int, default=PORT)
+    args = arg_parser.parse_args()
+
+    directory = args.directory or _get_publish_directory()
+    webServer = create_server(directory, args.host, args.port)
+    print(f"server started on port {args.port}, serving '{directory}'")
 
     try:
         webServer.serve_forever()
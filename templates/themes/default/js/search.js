@@ -0,0 +1,120 @@
+/*
+ * Client for the search index that `gen make` writes to `search/` in the publish
+ * directory when "search" is enabled in config.json. Only the shards holding the
+ * terms of the query, and the titles of the results, are downloaded.
+ *
+ *   const search = new GenSearch("./");
+ *   const results = await search.query("static site");  // [{url, title, score}]
+ *
+ * GenSearch.attach(input, list, root) wires a text input to a list of results.
+ */
+(function (global) {
+  "use strict";
+
+  // Same as TOKEN and MAX_TERM_LENGTH in generator/search.py
+  const TOKEN = /[\p{L}\p{N}]{2,}/gu;
+  const MAX_TERM_LENGTH = 32;
+
+  // Splits the text like _tokenize in generator/search.py does. The stop words are
+  // never indexed, so they're read from meta.json and dropped from queries as well.
+  function tokenize(text, stopWords) {
+    return (text.toLowerCase().match(TOKEN) || []).filter(
+      (token) => token.length <= MAX_TERM_LENGTH && !stopWords.has(token)
+    );
+  }
+
+  class GenSearch {
+    constructor(root) {
+      this.root = root || "./";
+      this._files = new Map();
+    }
+
+    /*
+     * Returns the articles holding every word of the query, the best matches first.
+     * The last word also matches longer terms, so that results show up while typing.
+     */
+    async query(text, limit = 20) {
+      const meta = await this._fetch("search/meta.json");
+      const tokens = meta ? tokenize(text, new Set(meta.stop_words || [])) : [];
+      if (!meta || tokens.length === 0) {
+        return [];
+      }
+
+      let scores = null;
+      for (const [position, token] of tokens.entries()) {
+        const prefix = token.slice(0, meta.prefix_length);
+        const shard = (await this._fetch(`search/terms/${encodeURIComponent(prefix)}.json`)) || {};
+        const isLast = position === tokens.length - 1;
+
+        const matches = new Map();
+        for (const [term, postings] of Object.entries(shard)) {
+          if (term !== token && !(isLast && term.startsWith(token))) {
+            continue;
+          }
+          for (const [document, weight] of postings) {
+            matches.set(document, Math.max(matches.get(document) || 0, weight));
+          }
+        }
+
+        if (scores === null) {
+          scores = matches;
+        } else {
+          for (const [document, score] of scores) {
+            if (matches.has(document)) {
+              scores.set(document, score + matches.get(document));
+            } else {
+              scores.delete(document);
+            }
+          }
+        }
+      }
+
+      const ranked = [...scores].sort((a, b) => b[1] - a[1] || a[0] - b[0]).slice(0, limit);
+      return Promise.all(
+        ranked.map(async ([document, score]) => {
+          const number = Math.floor(document / meta.documents_per_shard);
+          const documents = (await this._fetch(`search/docs/${number}.json`)) || {};
+          const [url, title] = documents[document] || ["", ""];
+          return { url: this.root + url, title: title, score: score };
+        })
+      );
+    }
+
+    // Fetches a file of the index once; missing files resolve to null
+    _fetch(path) {
+      if (!this._files.has(path)) {
+        this._files.set(
+          path,
+          fetch(this.root + path).then((response) => (response.ok ? response.json() : null))
+        );
+      }
+      return this._files.get(path);
+    }
+
+    static attach(input, list, root) {
+      const search = new GenSearch(root);
+      let latest = 0;
+      input.addEventListener("input", async () => {
+        const current = ++latest;
+        const results = await search.query(input.value);
+        // A later query finished first
+        if (current !== latest) {
+          return;
+        }
+        list.replaceChildren(
+          ...results.map((result) => {
+            const item = document.createElement("li");
+            const link = document.createElement("a");
+            link.href = result.url;
+            link.textContent = result.title;
+            item.appendChild(link);
+            return item;
+          })
+        );
+      });
+      return search;
+    }
+  }
+
+  global.GenSearch = GenSearch;
+})(window);